@@ -0,0 +1,74 @@
+from bisect import bisect_left
+from typing import Any, Iterable, List, Optional
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QObject, Qt
+
+
+class FilterListModel(QAbstractListModel):
+    """
+    Sorted list of strings with a case-insensitive substring filter.
+
+    When the new filter text extends the previous one, only the rows that
+    already matched are re-checked, so typing narrows the result set instead
+    of rescanning every item. Adding or removing an item inserts or removes
+    just that row.
+    """
+
+    def __init__(self, items: Iterable[str] = (), parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.items: List[str] = sorted(set(items))
+        self.rows: List[str] = list(self.items)
+        self.filter_text: str = ""
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or not 0 <= index.row() < len(self.rows):
+            return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return self.rows[index.row()]
+        return None
+
+    def item(self, row: int) -> str:
+        return self.rows[row]
+
+    def matches(self, item: str) -> bool:
+        return self.filter_text in item.lower()
+
+    def set_filter(self, text: str) -> None:
+        text = text.strip().lower()
+        if text == self.filter_text:
+            return
+
+        source = self.rows if text.startswith(self.filter_text) else self.items
+        self.beginResetModel()
+        self.filter_text = text
+        self.rows = [item for item in source if self.matches(item)]
+        self.endResetModel()
+
+    def add_item(self, item: str) -> bool:
+        position = bisect_left(self.items, item)
+        if position < len(self.items) and self.items[position] == item:
+            return False
+        self.items.insert(position, item)
+
+        if self.matches(item):
+            row = bisect_left(self.rows, item)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.rows.insert(row, item)
+            self.endInsertRows()
+        return True
+
+    def remove_item(self, item: str) -> bool:
+        position = bisect_left(self.items, item)
+        if position >= len(self.items) or self.items[position] != item:
+            return False
+        del self.items[position]
+
+        row = bisect_left(self.rows, item)
+        if row < len(self.rows) and self.rows[row] == item:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.rows[row]
+            self.endRemoveRows()
+        return True
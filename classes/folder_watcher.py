@@ -0,0 +1,350 @@
+import os
+import time
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Set, Tuple
+
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+from classes.worker import GeneratorWorker
+from scripts.folder_index import FolderIndex, is_index_folder, peek_folder_index, scan_folder_stats
+from scripts.scan_rules import ScanRules
+
+WATCH_DEPTH: int = 2
+BATCH_DELAY_MS: int = 1000
+MAX_BATCH_DELAY_MS: int = 5000
+CONSISTENCY_CHECK_MS: int = 10 * 60 * 1000
+SAVE_DELAY_MS: int = 60 * 1000
+SWEEP_LIST_LIMIT: int = 2000
+SWEEP_PASS_DELAY_MS: int = 2000
+WATCH: int = 0
+UNWATCH: int = 1
+MODIFIED: int = 2
+ADD_TREE: int = 3
+REMOVE_TREE: int = 4
+STATS: int = 5
+
+
+class FolderIndexWatcher(QObject):
+    """
+    Keeps the folder index in sync with the disk without full rebuilds.
+
+    Directories up to WATCH_DEPTH levels below each root are watched with
+    QFileSystemWatcher (inotify on Linux, ReadDirectoryChangesW on Windows).
+    Change notifications are coalesced into batches; each changed directory is
+    re-listed and diffed against its previous listing, so adds, renames and
+    deletes touch only the affected subtrees.
+
+    All disk access runs on a single GeneratorWorker: re-listing changed
+    directories, walking and scanning added subtrees, and the consistency
+    check. The GUI thread only applies the yielded results to the index and
+    the watcher. The consistency check first lists the watched directories,
+    then re-lists every indexed folder (at any depth) whose mtime changed since
+    the previous sweep and diffs it against the index's children, so it also
+    picks up folders added or removed while the app was closed. A pass lists at
+    most SWEEP_LIST_LIMIT folders; the rest are left to follow-up passes
+    SWEEP_PASS_DELAY_MS apart.
+    """
+    index_changed = pyqtSignal()
+
+    def __init__(self, roots: List[str], rules: ScanRules, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.roots: List[str] = list(roots)
+        self.rules: ScanRules = rules
+
+        self.listings: Dict[str, Set[str]] = {}
+        self.mtimes: Dict[str, int] = {}
+        self.pending: Set[str] = set()
+        self.first_pending_at: Optional[float] = None
+        self.worker: Optional[GeneratorWorker] = None
+        self.worker_changed: bool = False
+        self.check_requested: bool = False
+        self.sweep_mtimes: Dict[str, int] = {}
+        self.sweep_deferred: bool = False
+
+        self.watcher: QFileSystemWatcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.directory_changed)
+
+        self.batch_timer: QTimer = QTimer(self)
+        self.batch_timer.setSingleShot(True)
+        self.batch_timer.setInterval(BATCH_DELAY_MS)
+        self.batch_timer.timeout.connect(self.process_pending)
+
+        self.check_timer: QTimer = QTimer(self)
+        self.check_timer.setInterval(CONSISTENCY_CHECK_MS)
+        self.check_timer.timeout.connect(self.consistency_check)
+
+        self.pass_timer: QTimer = QTimer(self)
+        self.pass_timer.setSingleShot(True)
+        self.pass_timer.setInterval(SWEEP_PASS_DELAY_MS)
+        self.pass_timer.timeout.connect(self.consistency_check)
+
+        self.save_timer: QTimer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(SAVE_DELAY_MS)
+        self.save_timer.timeout.connect(self.save_index)
+
+    def start(self) -> None:
+        self.check_timer.start()
+        self.consistency_check()
+
+    def stop(self) -> None:
+        self.batch_timer.stop()
+        self.check_timer.stop()
+        self.pass_timer.stop()
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+            self.worker = None
+        if self.save_timer.isActive():
+            self.save_timer.stop()
+            self.save_index()
+
+    def depth(self, path: str) -> Optional[int]:
+        for root in self.roots:
+            if path == root:
+                return 0
+            if path.startswith(os.path.join(root, "")):
+                return os.path.relpath(path, root).count(os.sep) + 1
+        return None
+
+    def list_dirs(self, path: str) -> Set[str]:
+        return {os.path.join(path, folder) for folder in self.rules.list_dirs(path)}
+
+    def iter_watch_tree(
+        self,
+        top: str,
+        is_cancelled: Callable[[], bool] = lambda: False,
+    ) -> Generator[Tuple[str, Set[str], int], None, None]:
+        """(directory, subdirectories, mtime) for every directory to watch under top; touches no Qt objects."""
+        depth = self.depth(top)
+        if depth is None or depth > WATCH_DEPTH or self.rules.is_excluded(top):
+            return
+
+        stack: List[str] = [top]
+        while stack:
+            if is_cancelled():
+                return
+            path = stack.pop()
+            listing = self.list_dirs(path)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            yield path, listing, mtime
+            if self.depth(path) < WATCH_DEPTH:
+                stack.extend(listing)
+
+    def watch(self, path: str, listing: Set[str], mtime: int) -> None:
+        self.listings[path] = listing
+        self.mtimes[path] = mtime
+        self.watcher.addPath(path)
+
+    def unwatch_tree(self, top: str) -> None:
+        prefix = os.path.join(top, "")
+        for path in [path for path in self.listings if path == top or path.startswith(prefix)]:
+            self.listings.pop(path, None)
+            self.mtimes.pop(path, None)
+            self.watcher.removePath(path)
+
+    def directory_changed(self, path: str) -> None:
+        self.pending.add(path)
+        now = time.monotonic()
+        if self.first_pending_at is None:
+            self.first_pending_at = now
+
+        if (now - self.first_pending_at) * 1000 >= MAX_BATCH_DELAY_MS:
+            self.process_pending()
+        else:
+            self.batch_timer.start()
+
+    def process_pending(self) -> None:
+        self.batch_timer.stop()
+        if self.worker is not None:
+            return
+
+        pending, self.pending, self.first_pending_at = self.pending, set(), None
+        listings: Dict[str, Set[str]] = {path: self.listings[path] for path in pending if path in self.listings}
+        if listings:
+            self.run_worker(lambda is_cancelled: self.rescan(listings, is_cancelled))
+
+    def consistency_check(self) -> None:
+        if self.worker is not None:
+            self.check_requested = True
+            return
+
+        self.check_requested = False
+        watched: Dict[str, int] = dict(self.mtimes)
+        self.run_worker(lambda is_cancelled: self.sweep(watched, is_cancelled))
+
+    def run_worker(self, generator_factory: Callable[[Callable[[], bool]], Iterable[Tuple[Any, ...]]]) -> None:
+        worker: GeneratorWorker = GeneratorWorker(generator_factory, parent=self)
+        worker.batch_ready.connect(lambda items, w=worker: self.apply_items(w, items))
+        worker.done.connect(lambda cancelled, w=worker: self.worker_done(w))
+        self.worker = worker
+        self.worker_changed = False
+        worker.start()
+
+    def scan_tree(self, index: FolderIndex, top: str) -> Generator[Tuple[Any, ...], None, None]:
+        """(ADD_TREE, top, stats, order) for a subtree the index does not have yet."""
+        if top in index.positions or index.children(top) or self.rules.is_excluded(top):
+            return
+
+        stats: Dict[str, List[float]] = {}
+        order: List[str] = []
+        scan_folder_stats(top, stats, order, self.rules)
+        yield ADD_TREE, top, stats, order
+
+    def scan_stats(self, top: str) -> Tuple[Any, ...]:
+        stats: Dict[str, List[float]] = {}
+        scan_folder_stats(top, stats, rules=self.rules)
+        return STATS, top, stats
+
+    def rescan(self, listings: Dict[str, Set[str]], is_cancelled: Callable[[], bool]) -> Generator[Tuple[Any, ...], None, None]:
+        """
+        Runs on the worker. Re-lists each changed watched directory and diffs it against
+        its previous listing; added subtrees are walked for watching and scanned for the index.
+        """
+        index: Optional[FolderIndex] = peek_folder_index(self.roots)
+        for path in sorted(listings):
+            if is_cancelled():
+                return
+
+            current: Set[str] = self.list_dirs(path)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = 0
+            yield WATCH, path, current, mtime
+
+            for removed in listings[path] - current:
+                yield UNWATCH, removed
+                yield REMOVE_TREE, removed
+            for added in current - listings[path]:
+                for watched in self.iter_watch_tree(added, is_cancelled):
+                    yield (WATCH, *watched)
+                if index is not None:
+                    yield from self.scan_tree(index, added)
+            if index is not None and path in index.positions:
+                yield self.scan_stats(path)
+
+    def sweep(self, watched: Dict[str, int], is_cancelled: Callable[[], bool]) -> Generator[Tuple[Any, ...], None, None]:
+        """
+        Runs on the worker. Yields WATCH items for the initial watch walk, MODIFIED for watched
+        directories whose mtime changed, and index updates for indexed parents whose subfolders
+        differ from the index or whose stats are older than the directory itself.
+        """
+        if not watched:
+            for root in self.roots:
+                if os.path.isdir(root):
+                    for path, listing, mtime in self.iter_watch_tree(root, is_cancelled):
+                        yield WATCH, path, listing, mtime
+        else:
+            for path, mtime in watched.items():
+                try:
+                    if os.stat(path).st_mtime_ns == mtime:
+                        continue
+                except OSError:
+                    pass
+                yield MODIFIED, path
+
+        index: Optional[FolderIndex] = peek_folder_index(self.roots)
+        if index is None:
+            return
+
+        parents: Set[str] = {os.path.join(root, name) for root in self.roots for name in self.rules.list_dirs(root)}
+        with index.lock:
+            for folder in index.positions:
+                parents.add(folder)
+                parents.add(os.path.dirname(folder))
+            stats: Dict[str, List[float]] = {parent: index.stats[parent] for parent in parents if parent in index.stats}
+
+        mtimes: Dict[str, int] = {}
+        listed = 0
+        deferred = False
+        for parent in sorted(parents):
+            if is_cancelled():
+                return
+            if not self.depth(parent):
+                continue
+
+            try:
+                parent_stat = os.stat(parent)
+            except OSError:
+                for child in index.children(parent):
+                    yield REMOVE_TREE, child
+                continue
+
+            previous = self.sweep_mtimes.get(parent)
+            if previous == parent_stat.st_mtime_ns:
+                mtimes[parent] = previous
+                continue
+            if listed >= SWEEP_LIST_LIMIT:
+                deferred = True
+                if previous is not None:
+                    mtimes[parent] = previous
+                continue
+
+            listed += 1
+            mtimes[parent] = parent_stat.st_mtime_ns
+            listing = self.list_dirs(parent)
+            current = index.children(parent)
+            folder_stats = stats.get(parent)
+            stale = folder_stats is not None and (previous is not None or parent_stat.st_mtime > folder_stats[2])
+            if not stale and listing == current:
+                continue
+
+            for removed in current - listing:
+                yield REMOVE_TREE, removed
+            for added in listing - current:
+                if is_index_folder(added, self.roots):
+                    yield from self.scan_tree(index, added)
+            if stale:
+                yield self.scan_stats(parent)
+            yield MODIFIED, parent
+        self.sweep_mtimes = mtimes
+        self.sweep_deferred = deferred
+
+    def apply_items(self, worker: GeneratorWorker, items: List[Tuple[Any, ...]]) -> None:
+        if worker is not self.worker:
+            return
+
+        index: Optional[FolderIndex] = peek_folder_index(self.roots)
+        for kind, path, *rest in items:
+            if kind == WATCH:
+                # Skip folders already unwatched along with a removed parent.
+                if not self.depth(path) or os.path.dirname(path) in self.listings:
+                    self.watch(path, *rest)
+            elif kind == UNWATCH:
+                self.unwatch_tree(path)
+            elif kind == MODIFIED:
+                self.pending.add(path if os.path.isdir(path) else os.path.dirname(path))
+            elif index is None:
+                continue
+            elif kind == ADD_TREE:
+                self.worker_changed |= index.apply_tree(path, *rest) > 0
+            elif kind == REMOVE_TREE:
+                self.worker_changed |= index.remove_tree(path) > 0
+            elif kind == STATS:
+                self.worker_changed |= index.apply_stats(path, *rest)
+
+    def worker_done(self, worker: GeneratorWorker) -> None:
+        if worker is not self.worker:
+            return
+
+        self.worker = None
+        if self.worker_changed:
+            self.worker_changed = False
+            self.save_timer.start()
+            self.index_changed.emit()
+        if self.sweep_deferred:
+            self.sweep_deferred = False
+            self.pass_timer.start()
+
+        if self.check_requested:
+            self.consistency_check()
+        elif self.pending:
+            self.process_pending()
+
+    def save_index(self) -> None:
+        index: Optional[FolderIndex] = peek_folder_index(self.roots)
+        if index is not None:
+            index.save()
@@ -0,0 +1,111 @@
+from typing import Any, Iterable, List, Optional, Tuple
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QObject, QSortFilterProxyModel, Qt
+from PyQt5.QtGui import QColor
+
+from scripts.get_same_artists_folders import Candidate
+
+DECISION_COLUMN: int = 0
+SCORE_COLUMN: int = 1
+FOLDER_COLUMN: int = 2
+ARTIST_COLUMN: int = 3
+DECISION_COLORS = {True: QColor(76, 175, 80, 90), False: QColor(244, 67, 54, 90)}
+
+
+class PairReviewModel(QAbstractTableModel):
+    """
+    Borderline GSAF pairs with a pending decision per row:
+    True = accept (whitelist), False = ignore (blacklist), None = undecided.
+    """
+    headers: List[str] = ["Decision", "Score", "Folder", "Artist"]
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.candidates: List[Candidate] = []
+        self.decisions: List[Optional[bool]] = []
+
+    def set_candidates(self, candidates: Iterable[Candidate]) -> None:
+        self.beginResetModel()
+        self.candidates = list(candidates)
+        self.decisions = [None] * len(self.candidates)
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.candidates)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.headers[section]
+        return None
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+
+        candidate = self.candidates[index.row()]
+        decision = self.decisions[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == DECISION_COLUMN:
+                return {True: "Accept", False: "Ignore", None: ""}[decision]
+            if column == SCORE_COLUMN:
+                return f"{candidate.similarity}%"
+            if column == FOLDER_COLUMN:
+                return candidate.original_folder_name
+            return candidate.artist_name
+        if role == Qt.ItemDataRole.UserRole:
+            if column == DECISION_COLUMN:
+                return {True: 2, False: 1, None: 0}[decision]
+            if column == SCORE_COLUMN:
+                return candidate.similarity
+            return self.data(index).lower()
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"{candidate.pair[0]} - {candidate.pair[1]}"
+        if role == Qt.ItemDataRole.BackgroundRole:
+            return DECISION_COLORS.get(decision)
+        return None
+
+    def set_decision(self, rows: Iterable[int], decision: Optional[bool]) -> None:
+        for row in rows:
+            if self.decisions[row] != decision:
+                self.decisions[row] = decision
+                self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def decided(self) -> List[Tuple[Candidate, bool]]:
+        return [
+            (candidate, decision)
+            for candidate, decision in zip(self.candidates, self.decisions)
+            if decision is not None
+        ]
+
+
+class PairReviewFilter(QSortFilterProxyModel):
+    """Filters review rows by a score range and a case-insensitive folder/artist substring."""
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.text: str = ""
+        self.min_score: int = 0
+        self.max_score: int = 100
+        self.setSortRole(Qt.ItemDataRole.UserRole)
+
+    def set_text(self, text: str) -> None:
+        self.text = text.strip().lower()
+        self.invalidateFilter()
+
+    def set_score_range(self, min_score: int, max_score: int) -> None:
+        self.min_score, self.max_score = min_score, max_score
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        candidate: Candidate = self.sourceModel().candidates[source_row]
+        if not self.min_score <= candidate.similarity <= self.max_score:
+            return False
+        return not self.text or self.text in candidate.original_folder_name.lower() or self.text in candidate.artist_name.lower()
+
+    def source_rows(self) -> List[int]:
+        """Source rows of every row that passes the filter."""
+        return [self.mapToSource(self.index(row, 0)).row() for row in range(self.rowCount())]
@@ -0,0 +1,211 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from PyQt5.QtCore import QObject, QRunnable, QSize, QThreadPool, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+
+THUMBNAIL_CACHE_DIR: str = "thumbnail_cache"
+THUMBNAIL_CACHE_MAX_BYTES: int = 200 * 1024 * 1024
+THUMBNAIL_SIZE: QSize = QSize(96, 96)
+THUMBNAILS_PER_FOLDER: int = 6
+IMAGE_EXTENSIONS: Tuple[str, ...] = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp")
+CONTENT_KEY_BYTES: int = 64 * 1024
+
+
+class ThumbnailCache:
+    """
+    On-disk thumbnail cache keyed by image content and thumbnail size: the file
+    size plus a digest of its first and last CONTENT_KEY_BYTES. A renamed or moved
+    folder keeps hitting the cache, while an edited image gets a new entry.
+
+    Entries are JPEG files; a hit touches the file mtime, and when the total
+    size goes over `max_bytes` the least recently used files are deleted.
+    """
+
+    def __init__(self, directory: str = THUMBNAIL_CACHE_DIR, max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES) -> None:
+        self.directory: str = directory
+        self.max_bytes: int = max_bytes
+        self.entries: Dict[str, Tuple[int, float]] = {}
+        self.total_bytes: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    entry_stat = entry.stat()
+                    self.entries[entry.path] = (entry_stat.st_size, entry_stat.st_mtime)
+                    self.total_bytes += entry_stat.st_size
+
+    def key_path(self, image_path: str, size: QSize) -> Optional[str]:
+        digest = hashlib.sha1()
+        try:
+            with open(image_path, "rb") as f:
+                file_size = os.fstat(f.fileno()).st_size
+                digest.update(f.read(CONTENT_KEY_BYTES))
+                if file_size > CONTENT_KEY_BYTES:
+                    f.seek(max(CONTENT_KEY_BYTES, file_size - CONTENT_KEY_BYTES))
+                    digest.update(f.read(CONTENT_KEY_BYTES))
+        except OSError:
+            return None
+
+        digest.update(f"|{file_size}|{size.width()}x{size.height()}".encode("utf-8"))
+        return os.path.join(self.directory, digest.hexdigest() + ".jpg")
+
+    def get(self, path: str) -> Optional[QImage]:
+        with self._lock:
+            if path not in self.entries:
+                return None
+            self.entries[path] = (self.entries[path][0], time.time())
+
+        image = QImage(path)
+        if image.isNull():
+            self.discard(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return image
+
+    def put(self, path: str, image: QImage) -> None:
+        if not image.save(path, "JPG", 85):
+            return
+
+        size = os.path.getsize(path)
+        with self._lock:
+            previous = self.entries.get(path)
+            if previous is not None:
+                self.total_bytes -= previous[0]
+            self.entries[path] = (size, time.time())
+            self.total_bytes += size
+            self.evict()
+
+    def discard(self, path: str) -> None:
+        with self._lock:
+            entry = self.entries.pop(path, None)
+            if entry is not None:
+                self.total_bytes -= entry[0]
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self) -> None:
+        if self.total_bytes <= self.max_bytes:
+            return
+
+        for path, (size, _) in sorted(self.entries.items(), key=lambda item: item[1][1]):
+            if self.total_bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            del self.entries[path]
+            self.total_bytes -= size
+
+
+def list_folder_images(folder: str, limit: int = THUMBNAILS_PER_FOLDER) -> List[str]:
+    """First `limit` images in the folder, falling back to its subfolders when it has none."""
+    images: List[str] = []
+    subfolders: List[str] = []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name.lower()):
+                if entry.is_dir():
+                    subfolders.append(entry.path)
+                elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    images.append(entry.path)
+                    if len(images) >= limit:
+                        return images
+    except OSError:
+        return images
+
+    for subfolder in subfolders:
+        if images:
+            break
+        images.extend(list_folder_images(subfolder, limit))
+    return images[:limit]
+
+
+def decode_thumbnail(image_path: str, size: QSize) -> QImage:
+    """Decodes straight to thumbnail size; the full-resolution image is never materialized."""
+    reader = QImageReader(image_path)
+    reader.setAutoTransform(True)
+    source_size = reader.size()
+    if source_size.isValid():
+        reader.setScaledSize(source_size.scaled(size, Qt.AspectRatioMode.KeepAspectRatio))
+    return reader.read()
+
+
+class ThumbnailSignals(QObject):
+    thumbnail_ready = pyqtSignal(int, str, int, QImage)
+
+
+class ThumbnailTask(QRunnable):
+    def __init__(self, loader: "ThumbnailLoader", generation: int, folder: str) -> None:
+        super().__init__()
+        self.loader = loader
+        self.generation: int = generation
+        self.folder: str = folder
+
+    def run(self) -> None:
+        if self.loader.generation != self.generation:
+            return
+
+        number = 0
+        for image_path in list_folder_images(self.folder):
+            if self.loader.generation != self.generation:
+                return
+
+            image: Optional[QImage] = None
+            cache_path = self.loader.cache.key_path(image_path, self.loader.size)
+            if cache_path is not None:
+                image = self.loader.cache.get(cache_path)
+            if image is None:
+                image = decode_thumbnail(image_path, self.loader.size)
+                if image.isNull():
+                    continue
+                if cache_path is not None:
+                    self.loader.cache.put(cache_path, image)
+
+            self.loader.signals.thumbnail_ready.emit(self.generation, self.folder, number, image)
+            number += 1
+
+
+class ThumbnailLoader(QObject):
+    """
+    Loads folder thumbnail strips on a QThreadPool.
+
+    Each `request` queues one task per folder; results arrive through
+    `thumbnail_ready(folder, number, image)` in the GUI thread. `cancel` drops
+    queued tasks and makes running ones stop and discard their results.
+    """
+    thumbnail_ready = pyqtSignal(str, int, QImage)
+
+    def __init__(self, size: QSize = THUMBNAIL_SIZE, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.size: QSize = size
+        self.cache: ThumbnailCache = ThumbnailCache()
+        self.generation: int = 0
+
+        self.pool: QThreadPool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(2, min(4, QThreadPool.globalInstance().maxThreadCount())))
+
+        self.signals: ThumbnailSignals = ThumbnailSignals(self)
+        self.signals.thumbnail_ready.connect(self.on_thumbnail_ready)
+
+    def request(self, folder: str) -> None:
+        self.pool.start(ThumbnailTask(self, self.generation, folder))
+
+    def cancel(self) -> None:
+        self.generation += 1
+        self.pool.clear()
+
+    def on_thumbnail_ready(self, generation: int, folder: str, number: int, image: QImage) -> None:
+        if generation == self.generation:
+            self.thumbnail_ready.emit(folder, number, image)
@@ -0,0 +1,59 @@
+import time
+from typing import Any, Callable, Iterable, List, Optional
+
+from PyQt5.QtCore import QThread, QObject, pyqtSignal
+
+
+class GeneratorWorker(QThread):
+    """
+    Runs a generator outside the GUI thread and emits its items in batches.
+
+    The factory gets the worker's `is_cancelled` so long walks can stop early;
+    a batch is flushed when it is full or `flush_interval` seconds have passed,
+    so the first results reach the UI before the generator is exhausted.
+    """
+    batch_ready = pyqtSignal(list)
+    done = pyqtSignal(bool)
+
+    def __init__(
+            self,
+            generator_factory: Callable[[Callable[[], bool]], Iterable[Any]],
+            batch_size: int = 50,
+            flush_interval: float = 0.1,
+            parent: Optional[QObject] = None,
+        ) -> None:
+        super().__init__(parent)
+        self.generator_factory = generator_factory
+        self.batch_size: int = batch_size
+        self.flush_interval: float = flush_interval
+        self._cancelled: bool = False
+
+        self.finished.connect(self.deleteLater)
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self) -> None:
+        batch: List[Any] = []
+        last_flush: float = time.monotonic()
+
+        try:
+            for item in self.generator_factory(self.is_cancelled):
+                if self._cancelled:
+                    break
+
+                batch.append(item)
+                now = time.monotonic()
+                if len(batch) >= self.batch_size or now - last_flush >= self.flush_interval:
+                    self.batch_ready.emit(batch)
+                    batch = []
+                    last_flush = now
+        except Exception as e:
+            print(f"[ERROR] {self.__class__.__name__}: {e=}")
+
+        if batch and not self._cancelled:
+            self.batch_ready.emit(batch)
+        self.done.emit(self._cancelled)
@@ -2,12 +2,17 @@ from typing import Callable, Dict, List, Literal, Optional, TYPE_CHECKING
 
 from PyQt5.QtWidgets import QMainWindow, QStackedWidget, QApplication
 from PyQt5.QtCore import QSize, QObject, QRect, QPoint, QMargins
-from PyQt5.QtGui import QResizeEvent
+from PyQt5.QtGui import QResizeEvent, QCloseEvent
 
 if TYPE_CHECKING:
     from views.base_view import BaseView
 
-from scripts.deleter_empty_folder_and_more import delete_from_black_list, get_bl_artist
+from scripts.blacklist_store import BLACKLIST
+from scripts.deleter_empty_folder_and_more import add_to_black_list, delete_from_black_list, get_bl_artist
+from scripts.find_folder import EXCLUDES, PATHS
+from scripts.search_cache import SearchCache
+from classes.folder_watcher import FolderIndexWatcher
+import utils as U
 from utils import QSizeFloat, deduplicator
 
 class MainWindow(QMainWindow):
@@ -52,13 +57,23 @@ class MainWindow(QMainWindow):
         self.same_ext_view: SameExtView = SameExtView(self)
         self.stacked_widget.addWidget(self.same_ext_view)
         
-        self.search_history: List[str] = []
+        data: Dict = U.load_data() or {}
+        self.search_history: List[str] = data.get("FF_search_history", [])
+        self.search_cache: SearchCache = SearchCache.load()
+
+        self.folder_watcher: FolderIndexWatcher = FolderIndexWatcher(PATHS, EXCLUDES, self)
+        self.folder_watcher.start()
 
         self.change_view(self.main_view)
     
     def resizeEvent(self, event: QResizeEvent) -> None:
         self.window_size = event.size()
         super().resizeEvent(event)
+
+    def closeEvent(self, event: QCloseEvent) -> None:
+        self.folder_watcher.stop()
+        BLACKLIST.flush()
+        super().closeEvent(event)
     
     @staticmethod
     def get_main_window(obj: Optional[QObject]) -> Optional['MainWindow']:
@@ -120,10 +135,22 @@ class MainWindow(QMainWindow):
         self.search_history = deduplicator(self.search_history)
         if len(self.search_history) > 10:
             self.search_history.pop()
+        self.save_search_state()
+
+    def save_search_state(self) -> None:
+        data: Dict = U.load_data() or {}
+        data["FF_search_history"] = self.search_history
+        data.pop("FF_search_cache", None)
+        U.save_data(data)
+        self.save_search_cache()
+
+    def save_search_cache(self) -> None:
+        if self.search_cache.dirty:
+            self.search_cache.save()
 
     def show_black_list_manager(self) -> None:
         from styles.popups.base_popup import Position
         from styles.popups.list_popup import ListPopup
         black_list: Dict[Literal["VA", "Other"], List[str]] = get_bl_artist()
-        list_popup = ListPopup(self, "Black List Manager", black_list, delete_from_black_list, position=Position.CENTER, size=QSizeFloat(0.4, 0.8))
+        list_popup = ListPopup(self, "Black List Manager", black_list, delete_from_black_list, add_to_black_list, position=Position.CENTER, size=QSizeFloat(0.4, 0.8))
         list_popup.show()
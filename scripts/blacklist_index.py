@@ -0,0 +1,101 @@
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from scripts.deleter_empty_folder_and_more import plan_folder_rename
+from scripts.folder_index import FolderIndex
+
+BLACKLIST_INDEX_FILE: str = "blacklist_index.json"
+
+Rename = Tuple[str, str, str, str]
+
+
+class ArtistFolderIndex:
+    """
+    Индекс "нормализованная часть имени -> папки" для Black List Finder.
+
+    Строится по списку папок из полного обхода (get_new_name_folder) и хранится на диске,
+    поэтому новая или удалённая запись чёрного списка пересчитывается только по папкам,
+    в имени которых она встречается, без обхода всей библиотеки.
+    Токены и их списки папок берутся из FolderIndex.
+    """
+
+    def __init__(self, index: FolderIndex, path: str = BLACKLIST_INDEX_FILE) -> None:
+        self.index: FolderIndex = index
+        self.path: str = path
+
+    @property
+    def root(self) -> str:
+        return self.index.roots[0]
+
+    @classmethod
+    def build(cls, root: str, folders: Iterable[str], path: str = BLACKLIST_INDEX_FILE) -> "ArtistFolderIndex":
+        artist_index = cls(FolderIndex([os.path.normpath(root)], folders), path)
+        artist_index.save()
+        return artist_index
+
+    @classmethod
+    def load(cls, root: str, path: str = BLACKLIST_INDEX_FILE) -> Optional["ArtistFolderIndex"]:
+        index = FolderIndex.load(path)
+        if index is None or index.roots != [os.path.normpath(root)]:
+            return None
+        return cls(index, path)
+
+    def save(self) -> None:
+        self.index.save(self.path)
+
+    def plan_renames(self, names: Iterable[str], blacklist_set: Set[str]) -> Dict[str, Optional[Rename]]:
+        """
+        Для папок, в имени которых есть одна из names, - новое переименование или None,
+        если после изменения списка папку больше переименовывать не нужно.
+        Папки, которых уже нет на диске, выбрасываются из индекса.
+        """
+        folders: Set[str] = set()
+        for name in names:
+            folders.update(self.index.lookup(name))
+
+        renames: Dict[str, Optional[Rename]] = {}
+        for folder in folders:
+            if not os.path.isdir(folder):
+                self.index.remove_tree(folder)
+                renames[folder] = None
+                continue
+            renames[folder] = plan_folder_rename(os.path.dirname(folder), os.path.basename(folder), blacklist_set)
+        return renames
+
+    def move_tree(self, source: str, destination: str) -> None:
+        """Переносит в индексе папку source и всё, что под ней, на новый путь destination."""
+        with self.index.lock:
+            moved: List[str] = []
+            stack: List[str] = [source]
+            while stack:
+                folder = stack.pop()
+                stack.extend(self.index.children(folder))
+                if folder in self.index.positions:
+                    moved.append(folder)
+
+            self.index.remove_tree(source)
+            for folder in moved:
+                self.index.add_folder(destination + folder[len(source):])
+
+
+_artist_index: Optional[ArtistFolderIndex] = None
+_artist_index_lock: threading.Lock = threading.Lock()
+
+
+def get_artist_index(root: str) -> Optional[ArtistFolderIndex]:
+    """Индекс для root из памяти или с диска; None, если для root ещё не было полного обхода."""
+    global _artist_index
+
+    with _artist_index_lock:
+        if _artist_index is None or _artist_index.root != os.path.normpath(root):
+            _artist_index = ArtistFolderIndex.load(root)
+        return _artist_index
+
+
+def store_artist_index(root: str, folders: Iterable[str]) -> ArtistFolderIndex:
+    global _artist_index
+
+    with _artist_index_lock:
+        _artist_index = ArtistFolderIndex.build(root, folders)
+        return _artist_index
@@ -0,0 +1,152 @@
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Set
+
+BLACKLIST_FILE: str = "black_list_artist.txt"
+CATEGORIES: List[str] = ["VA", "Other"]
+SAVE_DELAY: float = 2.0
+
+
+def fix_folder_name(name: str) -> str:
+    return name.strip().lower().replace(" ", "_")
+
+
+class BlacklistStore:
+    """
+    Чёрный список артистов в памяти: нормализованные имена по категориям и общее множество для проверки.
+
+    Файл перечитывается только когда меняется его mtime. Правки сразу видны в памяти, а на диск
+    уходят одной атомарной записью через SAVE_DELAY секунд после последней правки (или при flush).
+    Подписчики получают (категория, имя, добавлено ли) после каждой правки из программы.
+    С fake_delete правка только проверяется: ни память, ни файл не меняются.
+    """
+
+    def __init__(self, path: str = BLACKLIST_FILE, save_delay: float = SAVE_DELAY) -> None:
+        self.path: str = path
+        self.save_delay: float = save_delay
+        self.categories: Dict[str, Set[str]] = {category: set() for category in CATEGORIES}
+        self.names: Set[str] = set()
+        self.mtime: Optional[int] = None
+        self.dirty: bool = False
+        self.listeners: List[Callable[[str, str, bool], None]] = []
+        self._timer: Optional[threading.Timer] = None
+        self._lock: threading.RLock = threading.RLock()
+
+    def refresh(self) -> None:
+        """Перечитывает файл, если он изменился на диске. Несохранённые правки не затираются."""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                if self.mtime is None and not self.dirty:
+                    self.dirty = True
+                    self.flush()
+                return
+            if mtime != self.mtime and not self.dirty:
+                self.load()
+                self.mtime = mtime
+
+    def load(self) -> None:
+        categories: Dict[str, Set[str]] = {category: set() for category in CATEGORIES}
+        with open(self.path, encoding="utf-8") as f:
+            current_type = None
+            for line in f:
+                line = line.strip()
+                if line.startswith("#"):
+                    current_type = line[1:]
+                    categories.setdefault(current_type, set())
+                elif current_type and line:
+                    categories[current_type].add(fix_folder_name(line))
+
+        self.categories = categories
+        self.names = set().union(*categories.values())
+
+    def get(self) -> Dict[str, List[str]]:
+        """Копия списка по категориям, отсортированная как в файле."""
+        with self._lock:
+            self.refresh()
+            return {category: sorted(names) for category, names in self.categories.items()}
+
+    def lookup_set(self) -> Set[str]:
+        """Копия общего множества имён всех категорий."""
+        with self._lock:
+            self.refresh()
+            return set(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            self.refresh()
+            return fix_folder_name(name) in self.names
+
+    def subscribe(self, listener: Callable[[str, str, bool], None]) -> None:
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[str, str, bool], None]) -> None:
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify(self, category: str, name: str, added: bool) -> None:
+        for listener in list(self.listeners):
+            listener(category, name, added)
+
+    def add(self, name: str, category: str = "VA", fake_delete: bool = False) -> bool:
+        name = fix_folder_name(name)
+        with self._lock:
+            self.refresh()
+            if not name or name in self.categories.get(category, ()):
+                return False
+            if fake_delete:
+                print("Was NOT saved because fake_delete is True")
+                return True
+            self.categories.setdefault(category, set()).add(name)
+            self.names.add(name)
+            self.schedule_save()
+        self.notify(category, name, True)
+        return True
+
+    def remove(self, category: str, name: str, fake_delete: bool = False) -> bool:
+        name = fix_folder_name(name)
+        with self._lock:
+            self.refresh()
+            names = self.categories.get(category, set())
+            if name not in names:
+                return False
+            if fake_delete:
+                print("Was NOT saved because fake_delete is True")
+                return True
+            names.discard(name)
+            if not any(name in other for other in self.categories.values()):
+                self.names.discard(name)
+            self.schedule_save()
+        self.notify(category, name, False)
+        return True
+
+    def schedule_save(self) -> None:
+        self.dirty = True
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.save_delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self) -> None:
+        """Сразу записывает несохранённые правки: во временный файл, затем os.replace."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self.dirty:
+                return
+
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, encoding="utf-8", mode="w") as f:
+                for category, names in self.categories.items():
+                    f.write(f"#{category}\n")
+                    for name in sorted(names):
+                        f.write(f"{name}\n")
+            os.replace(tmp_path, self.path)
+            self.mtime = os.stat(self.path).st_mtime_ns
+            self.dirty = False
+
+
+BLACKLIST: BlacklistStore = BlacklistStore()
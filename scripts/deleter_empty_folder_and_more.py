@@ -1,96 +1,65 @@
-import hashlib
 import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from pprint import pprint
 import shutil
-from typing import Generator, Set, Dict, List, Tuple
+from typing import Callable, Generator, Optional, Set, Dict, List, Tuple
 from send2trash import send2trash
 
-BLACKLIST_FILE = "black_list_artist.txt"
+from scripts.blacklist_store import BLACKLIST, fix_folder_name
+from scripts.folder_merge import ConflictPolicy, MergeAction, MergeResult, merge_folders
+from scripts.scan_rules import ScanRules
+from scripts.trash_signatures import TrashSignatureStore
+
 MIN_FILE_SIZE = 1024 * 1024
 TRASH_MD5_HASHES: Set[str] = {"b325d6ba8efb828686667aa58ab549e8"}
 BLACKLIST_KEYWORDS: Set[str] = {"voice_actor", "voiceactor", "voice-actor"}
+DEFAULT_HASH_WORKERS: int = 8
+HASH_QUEUE_PER_WORKER: int = 4
+TRASH_BATCH_SIZE: int = 500
 
 
-def save_black_list(data: Dict[str, List[str]], fake_delete: bool = False) -> None:
-    if fake_delete:
-        print("Was NOT saved because fake_delete is True")
-        return
-
-    with open(BLACKLIST_FILE, encoding="utf-8", mode="w") as f:
-        for type, _data in data.items():
-            f.write(f"#{type}\n")
-            for item in sorted(filter(bool, _data)):
-                f.write(f"{item}\n")
-
 def delete_from_black_list(category: str, artist: str, fake_delete: bool = True) -> Dict[str, List[str]]:
-    list_data = get_bl_artist()
-    list_data[category].remove(artist)
+    BLACKLIST.remove(category, artist, fake_delete)
+    return BLACKLIST.get()
 
-    save_black_list(list_data, fake_delete)
-    
-    return list_data
+def add_to_black_list(category: str, artist: str, fake_delete: bool = False) -> Optional[str]:
+    """Добавляет артиста в категорию. Возвращает нормализованное имя или None, если оно уже было в списке."""
+    if BLACKLIST.add(artist, category, fake_delete):
+        return fix_folder_name(artist)
+    return None
 
 def get_bl_artist(add: str = None, category: str = "VA", fake_delete: bool = False) -> Dict[str, List[str]]: 
-    data = {"VA": [], "Other": []}
-    try:
-        with open(BLACKLIST_FILE, encoding="utf-8") as f:
-            current_type = None
-            for line in f:
-                line = line.strip()
-                if line.startswith("#"):
-                    current_type = line[1:]
-                elif current_type and line:
-                    data[current_type].append(line)
-    except FileNotFoundError:
-        with open(BLACKLIST_FILE, encoding="utf-8", mode="w") as f:
-            f.write("#VA\n#Other\n")
-
-    data_black_list = {k: list(map(fix_folder_name, v)) for k, v in data.items()}
-    
     if add:
-        data_black_list.setdefault(category, []).append(fix_folder_name(add))
-        save_black_list(data_black_list, fake_delete)
-
-    return data_black_list
-
-def fix_folder_name(name: str) -> str:
-    return name.strip().lower().replace(" ", "_")
+        BLACKLIST.add(add, category, fake_delete)
+    return BLACKLIST.get()
 
 
-def move_files(source_dir: str, destination_dir: str, **kwargs) -> Tuple[bool, str]:
+def rename_folder(original_full_path_folder: str, fix_full_path: str, **kwargs) -> Tuple[bool, str]:
+    """
+    Переименовывает папку; если папка с новым именем уже есть, сливает их через merge_folders.
+    Успех - если ни один элемент не закончился ошибкой.
+    """
     fake_delete: bool = kwargs.get("fake_delete", False)
+    policy: ConflictPolicy = kwargs.get("policy", ConflictPolicy.REPLACE_IF_IDENTICAL)
 
-    if not os.path.exists(source_dir):
-        return False, f"Source folder does not exist: {source_dir}"
-
-    os.makedirs(destination_dir, exist_ok=True)
+    if not os.path.exists(original_full_path_folder):
+        return False, f"Source folder does not exist: {original_full_path_folder}"
 
-    log: str = ""
-    for filename in os.listdir(source_dir):
-        source_file = os.path.join(source_dir, filename)
-        destination_file = os.path.join(destination_dir, filename)
-        
-        if not fake_delete:
-            shutil.move(source_file, destination_file)
-        
-        log += f"File {filename} moved to {destination_dir}\n"
-
-    return True, log
-
-def rename_folder(original_full_path_folder: str, fix_full_path: str, **kwargs) -> Tuple[bool, str]:
-    fake_delete: bool = kwargs.get("fake_delete", False)
-    try:
+    if not os.path.exists(fix_full_path) or os.path.samefile(original_full_path_folder, fix_full_path):
         if not fake_delete:
             os.rename(original_full_path_folder, fix_full_path)
         return True, f"Deleted blacklisted name in folder name from {original_full_path_folder} \n-> to {fix_full_path}"
-    except FileExistsError as e:
-        result, log = move_files(original_full_path_folder, fix_full_path, fake_delete=fake_delete)
-        if not os.listdir(original_full_path_folder):
-            if not fake_delete:
-                os.rmdir(original_full_path_folder)
-            log += f"Folder {original_full_path_folder} deleted because it was empty\n"
 
-        return result, log
+    results: List[MergeResult] = merge_folders(original_full_path_folder, fix_full_path, policy, fake_delete)
+    log: List[str] = [f"Merged {original_full_path_folder} \n-> into {fix_full_path}"]
+    log.extend(str(result) for result in results if result.action != MergeAction.MERGED)
+    if not fake_delete and not os.path.exists(original_full_path_folder):
+        log.append(f"Folder {original_full_path_folder} deleted because it was empty")
+
+    success = all(result.action != MergeAction.ERROR for result in results)
+    return success, "\n".join(log)
 
 def del_bl_from_str(input_str: str, blacklist_set: Set[str]) -> str:
     sub_strs_folder = input_str.split("+")
@@ -107,38 +76,181 @@ def del_bl_from_str(input_str: str, blacklist_set: Set[str]) -> str:
         return f"!FBL_{input_str}"
     return "+".join(result)
 
-def get_new_name_folder(path: str) -> Generator:
-    def upd_blacklist() -> Set[str]:
-        _blacklist_set = set(blacklist.get("VA", []))
-        _blacklist_set.update({item for sublist in blacklist.values() if sublist != blacklist.get("VA", []) for item in sublist})
-        return _blacklist_set
-    
-    blacklist: Dict[str, List[str]] = get_bl_artist()
-    blacklist_set = upd_blacklist()
+def plan_folder_rename(dirpath: str, original_folder: str, blacklist_set: Set[str]) -> Optional[Tuple[str, str, str, str]]:
+    """(старое имя, новое имя, старый путь, новый путь) или None, если имя папки не меняется."""
+    clean_folder = original_folder.replace("++", "+").strip("+")
+    folder_name_fix_bl = del_bl_from_str(clean_folder, blacklist_set)
+    if folder_name_fix_bl == original_folder:
+        return None
 
-    folder_list: List[str] = list(set([
-        subfolder
-        for _, folders, _ in os.walk(path)
-        for folder in folders
-        for subfolder in folder.split("+")
-    ]))
+    original_full_path_folder = os.path.normpath(os.path.join(dirpath, original_folder))
+    fix_full_path = os.path.normpath(os.path.join(dirpath, folder_name_fix_bl))
+    return (original_folder, folder_name_fix_bl, original_full_path_folder, fix_full_path)
 
-    for sub_str_folder in folder_list:
-        fix_f_name = fix_folder_name(sub_str_folder)
-        if any(check in fix_f_name for check in BLACKLIST_KEYWORDS) and fix_f_name not in blacklist_set:
-            yield [sub_str_folder, blacklist]
-            blacklist_set = upd_blacklist()
+def get_new_name_folder(path: str, folders_seen: Optional[List[str]] = None) -> Generator:
+    """
+    Один обход снизу вверх: для каждой папки сначала спрашивает про новые части имени
+    с BLACKLIST_KEYWORDS, затем считает новое имя без частей из чёрного списка.
+
+    Вопрос отдаётся как [часть имени, множество чёрного списка]; чтобы внести часть в список,
+    вызывающий добавляет её (через fix_folder_name) прямо в это множество. Вопрос про часть
+    задаётся в первой папке, где она встретилась, поэтому все папки с ней обрабатываются уже после ответа.
+    В folders_seen, если он передан, складываются пути всех пройденных папок.
+    """
+    blacklist_set: Set[str] = BLACKLIST.lookup_set()
+    prompted: Set[str] = set()
     
     for dirpath, folders, _ in os.walk(path, topdown=False):
         for original_folder in folders:
-            original_full_path_folder = os.path.normpath(os.path.join(dirpath, original_folder))
-            clean_folder = original_folder.replace("++", "+").strip("+")
-            
-            folder_name_fix_bl = del_bl_from_str(clean_folder, blacklist_set)
-            
-            if folder_name_fix_bl != original_folder:
-                fix_full_path = os.path.normpath(os.path.join(dirpath, folder_name_fix_bl))
-                yield (original_folder, folder_name_fix_bl, original_full_path_folder, fix_full_path)
+            for sub_str_folder in original_folder.split("+"):
+                fix_f_name = fix_folder_name(sub_str_folder)
+                if fix_f_name in blacklist_set or fix_f_name in prompted:
+                    continue
+                if any(check in fix_f_name for check in BLACKLIST_KEYWORDS):
+                    prompted.add(fix_f_name)
+                    yield [sub_str_folder, blacklist_set]
+
+            if folders_seen is not None:
+                folders_seen.append(os.path.normpath(os.path.join(dirpath, original_folder)))
+            rename = plan_folder_rename(dirpath, original_folder, blacklist_set)
+            if rename is not None:
+                yield rename
+
+@dataclass
+class DeleteResult:
+    path: str
+    success: bool
+    message: str
+    parent_cleanup: bool = False
+
+
+def remove_empty_tree(
+    top: str,
+    rules: Optional[ScanRules] = None,
+    signatures: Optional[TrashSignatureStore] = None,
+) -> None:
+    """
+    Навсегда удаляет папку, которая при сканировании была фактически пустой, заново проверяя её содержимое:
+    удаляются только файлы, которые и сейчас совпадают с signatures (без signatures - никакие) и не исключены rules,
+    затем папки через os.rmdir снизу вверх. Если с момента сканирования что-то появилось,
+    os.rmdir для top падает с OSError и всё, кроме мусора, остаётся на месте.
+    """
+    for dirpath, _, files in os.walk(top, topdown=False):
+        if rules is not None and rules.is_excluded(dirpath):
+            continue
+        if signatures is not None:
+            for file in files:
+                full_path_file = os.path.join(dirpath, file)
+                if rules is not None and rules.is_excluded(full_path_file):
+                    continue
+                try:
+                    if signatures.match(full_path_file):
+                        os.remove(full_path_file)
+                except OSError:
+                    continue
+        if dirpath != top:
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                continue
+    os.rmdir(top)
+
+
+def _trash_or_remove(
+    paths: List[str],
+    trashcan: bool,
+    fake_delete: bool,
+    rules: Optional[ScanRules] = None,
+    signatures: Optional[TrashSignatureStore] = None,
+) -> Dict[str, Optional[Exception]]:
+    """
+    Удаляет пути и возвращает ошибку для каждого (None - успешно).
+    В корзину пути отправляются пачками по TRASH_BATCH_SIZE, при ошибке пачка повторяется поштучно;
+    пути, которые пачка успела убрать до ошибки, считаются удалёнными.
+    Навсегда папки удаляются через remove_empty_tree, а не целиком.
+    """
+    errors: Dict[str, Optional[Exception]] = {}
+    if fake_delete:
+        return dict.fromkeys(paths)
+
+    if trashcan:
+        for start in range(0, len(paths), TRASH_BATCH_SIZE):
+            batch = paths[start:start + TRASH_BATCH_SIZE]
+            existed: Set[str] = {path for path in batch if os.path.lexists(path)}
+            try:
+                send2trash(batch)
+                errors.update(dict.fromkeys(batch))
+            except Exception:
+                for path in batch:
+                    if path in existed and not os.path.lexists(path):
+                        errors[path] = None
+                        continue
+                    try:
+                        send2trash(path)
+                        errors[path] = None
+                    except Exception as e:
+                        errors[path] = e
+        return errors
+
+    for path in paths:
+        try:
+            if os.path.isdir(path) and not os.path.islink(path):
+                remove_empty_tree(path, rules, signatures)
+            else:
+                os.remove(path)
+            errors[path] = None
+        except Exception as e:
+            errors[path] = e
+    return errors
+
+
+def del_from_paths(
+    paths: List[str],
+    trashcan: bool = True,
+    auto_delete_empty_folders: bool = False,
+    **kwargs
+) -> List[DeleteResult]:
+    """
+    Удаляет сразу все пути: в корзину - пачками, папки-родители, ставшие пустыми,
+    проверяются по одному разу. Результат - по одному на каждый путь, затем по одному на удалённого родителя.
+    rules и del_trash_files - те же, что при сканировании: по ним remove_empty_tree решает,
+    какие файлы внутри папки можно удалить навсегда.
+    """
+    fake_delete: bool = kwargs.get("fake_delete", False)
+    rules: Optional[ScanRules] = kwargs.get("rules")
+    signatures: Optional[TrashSignatureStore] = None
+    if kwargs.get("del_trash_files", False) and not trashcan and not fake_delete:
+        signatures = load_trash_signatures()
+    paths = list(dict.fromkeys(paths))
+    kinds: Dict[str, str] = {path: "File" if os.path.isfile(path) else "Folder" for path in paths}
+    action: str = "moved to trash" if trashcan else "deleted permanently"
+
+    results: List[DeleteResult] = []
+    for path, error in _trash_or_remove(paths, trashcan, fake_delete, rules, signatures).items():
+        if error is None:
+            results.append(DeleteResult(path, True, f"{kinds[path]} \"{path}\" {action}"))
+        else:
+            results.append(DeleteResult(path, False, f"[!]  Error while deleting {path=}: {error=}"))
+
+    if not auto_delete_empty_folders:
+        return results
+
+    deleted: Set[str] = {result.path for result in results if result.success}
+    parents: List[str] = []
+    for parent_dir in sorted({os.path.dirname(path) for path in deleted} - deleted, key=len, reverse=True):
+        try:
+            if not os.listdir(parent_dir):
+                parents.append(parent_dir)
+        except OSError:
+            continue
+
+    for parent_dir, error in _trash_or_remove(parents, trashcan, fake_delete).items():
+        if error is None:
+            message = f"Folder \"{parent_dir}\" {action} because its last file/folder was deleted"
+        else:
+            message = f"[!]  Error while deleting {parent_dir=}: {error=}"
+        results.append(DeleteResult(parent_dir, error is None, message, parent_cleanup=True))
+    return results
 
 def del_from_path(
     path: str, 
@@ -146,56 +258,179 @@ def del_from_path(
     auto_delete_empty_folders: bool = False,
     **kwargs
 ) -> Tuple[bool, List[str]]:
-    fake_delete: bool = kwargs.get("fake_delete", False)
-    log_message: List[str] = []
+    results: List[DeleteResult] = del_from_paths([path], trashcan, auto_delete_empty_folders, **kwargs)
+    return results[0].success, [result.message for result in results]
 
-    try:
-        if trashcan:
-            if not fake_delete:
-                send2trash(path)
-            log_message.append(f"{'File' if os.path.isfile(path) else 'Folder'} \"{path}\" moved to trash")
-        else:
-            if not fake_delete:
-                if os.path.isfile(path):
-                    os.remove(path)
-                else:
-                    os.rmdir(path)
-            log_message.append(f"{'File' if os.path.isfile(path) else 'Folder'} \"{path}\" deleted permanently")
-        
-        if auto_delete_empty_folders:
-            parent_dir: str = os.path.dirname(path)
-            if not os.listdir(parent_dir):
-                if not fake_delete:
-                    if trashcan:
-                        send2trash(parent_dir)
-                    else:
-                        os.rmdir(parent_dir)
-                log_message.append(f"Folder \"{parent_dir}\" deleted permanently because it last file/folder was deleted")
+def load_trash_signatures() -> TrashSignatureStore:
+    """Сигнатуры мусорных файлов; TRASH_MD5_HASHES без известного размера доучиваются при сканировании."""
+    return TrashSignatureStore.load(legacy_md5=TRASH_MD5_HASHES, legacy_max_size=MIN_FILE_SIZE)
 
-        return True, log_message
-    except Exception as e:
-        log_message.append(f"[!]  Error while deleting {path=}: {e=}")
-        return False, log_message
+def add_trash_signatures(paths: List[str]) -> int:
+    store = load_trash_signatures()
+    added = 0
+    for path in paths:
+        try:
+            added += store.add_file(path)
+        except OSError as e:
+            print(f"[ERROR] add_trash_signatures {path=}: {e=}")
+    if store.dirty:
+        store.save()
+    return added
 
-def find_empty_folders(path: str, del_trash_files: bool = False) -> List[str]:
-    to_delete_items: List[str] = []
-    
-    for dirpath, folders, files in os.walk(path, topdown=False):
-        if del_trash_files:
+def get_hash_workers(path: str, workers_by_root: Dict[str, int]) -> int:
+    """Число потоков хэширования для path: по самому длинному подходящему корню, иначе DEFAULT_HASH_WORKERS."""
+    path = os.path.normcase(os.path.normpath(path))
+    best_root, workers = "", DEFAULT_HASH_WORKERS
+    for root, root_workers in workers_by_root.items():
+        root = os.path.normcase(os.path.normpath(root))
+        if (path == root or path.startswith(os.path.join(root, ""))) and len(root) > len(best_root):
+            best_root, workers = root, root_workers
+    return max(1, int(workers))
+
+@dataclass
+class ScanProgress:
+    """Счётчики сканирования, которые GUI может читать, пока скан идёт в другом потоке."""
+    dirs_visited: int = 0
+    candidates: int = 0
+
+
+class EmptyDirState:
+    """Состояние папки при обходе снизу вверх, пока не готовы хэши её файлов."""
+
+    def __init__(self, dirpath: str, folders: List[str], files: List[str]) -> None:
+        self.dirpath: str = dirpath
+        self.folders: List[str] = folders
+        self.files: List[str] = files
+        self.kept_files: int = 0
+        self.trash: List[Tuple[str, Optional[Future]]] = []
+
+    def ready(self) -> bool:
+        return all(future is None or future.done() for _, future in self.trash)
+
+
+def iter_empty_folders(
+    path: str,
+    del_trash_files: bool = False,
+    rules: Optional[ScanRules] = None,
+    signatures: Optional[TrashSignatureStore] = None,
+    workers: int = DEFAULT_HASH_WORKERS,
+    progress: Optional[ScanProgress] = None,
+    is_cancelled: Callable[[], bool] = lambda: False,
+) -> Generator[str, None, None]:
+    """
+    Потоковая версия find_empty_folders.
+
+    Папка считается фактически пустой, если в ней только фактически пустые папки и мусорные файлы.
+    Признак переносится снизу вверх за один обход, и отдаётся только самая верхняя такая папка,
+    а не её содержимое. Мусорные файлы отдаются отдельно, только если их папку удалить нельзя.
+    Решение по папке принимается, когда готовы хэши её файлов, поэтому папки идут в порядке обхода.
+    Мусорный файл, исключённый rules (EFF_whitelist), считается обычным и удерживает свою папку.
+
+    >>> import hashlib, tempfile
+    >>> top = tempfile.mkdtemp()
+    >>> for folder in ("G", "T"):
+    ...     os.mkdir(os.path.join(top, folder))
+    ...     with open(os.path.join(top, folder, "thumbs.jpg"), "wb") as f:
+    ...         _ = f.write(b"trash")
+    >>> from scripts.trash_signatures import prefix_digest
+    >>> signatures = TrashSignatureStore()
+    >>> signatures.add(5, prefix_digest(b"trash"), hashlib.md5(b"trash").hexdigest())
+    True
+    >>> signatures.dirty = False
+    >>> rules = ScanRules(exclude_paths=[os.path.join(top, "G", "thumbs.jpg")])
+    >>> found = iter_empty_folders(top, del_trash_files=True, rules=rules, signatures=signatures, workers=1)
+    >>> sorted(os.path.relpath(item, top) for item in found)
+    ['T']
+    >>> shutil.rmtree(top)
+    """
+    if del_trash_files and signatures is None:
+        signatures = load_trash_signatures()
+
+    executor: Optional[ThreadPoolExecutor] = ThreadPoolExecutor(workers) if del_trash_files and workers > 1 else None
+    in_flight: deque = deque()
+    undecided: deque = deque()
+    removable: Dict[str, bool] = {}
+
+    def decide(state: EmptyDirState) -> Generator[str, None, None]:
+        trash: List[str] = [file for file, future in state.trash if future is None or future.result()]
+        children: List[str] = [os.path.join(state.dirpath, folder) for folder in state.folders]
+        is_removable = (
+            state.dirpath != path
+            and state.kept_files == 0
+            and len(trash) == len(state.trash)
+            and all(removable.get(child, False) for child in children)
+            and len(os.listdir(state.dirpath)) == len(state.folders) + len(state.files)
+        )
+
+        if not is_removable:
+            found: List[str] = trash + [child for child in children if removable.get(child, False)]
+            if progress is not None:
+                progress.candidates += len(found)
+            for item in found:
+                yield os.path.normpath(item)
+        for child in children:
+            removable.pop(child, None)
+        removable[state.dirpath] = is_removable
+
+    try:
+        for dirpath, folders, files in (rules or ScanRules()).walk(path, topdown=False):
+            if is_cancelled():
+                return
+            if progress is not None:
+                progress.dirs_visited += 1
+
+            state: EmptyDirState = EmptyDirState(dirpath, folders, files)
             for file in files:
                 full_path_file = os.path.join(dirpath, file)
-                if os.path.getsize(full_path_file) >= MIN_FILE_SIZE:
+                if not del_trash_files or (rules is not None and rules.is_excluded(full_path_file)):
+                    state.kept_files += 1
+                    continue
+                try:
+                    size = os.path.getsize(full_path_file)
+                except OSError:
+                    state.kept_files += 1
+                    continue
+                if not signatures.might_match(size):
+                    state.kept_files += 1
                     continue
-                
-                with open(full_path_file, "rb") as file_data:
-                    md5_check = hashlib.file_digest(file_data, "md5").hexdigest()
-                if md5_check in TRASH_MD5_HASHES:
-                    to_delete_items.append(os.path.normpath(full_path_file))
 
-        if dirpath == path:
-            continue
-        
-        if not folders and not files:
-            to_delete_items.append(os.path.normpath(dirpath))
-    
-    return to_delete_items
\ No newline at end of file
+                if executor is None:
+                    if signatures.match(full_path_file, size):
+                        state.trash.append((full_path_file, None))
+                    else:
+                        state.kept_files += 1
+                    continue
+
+                future: Future = executor.submit(signatures.match, full_path_file, size)
+                state.trash.append((full_path_file, future))
+                in_flight.append(future)
+            undecided.append(state)
+
+            while len(in_flight) > workers * HASH_QUEUE_PER_WORKER:
+                in_flight.popleft().result()
+            while undecided and undecided[0].ready():
+                yield from decide(undecided.popleft())
+
+        while undecided:
+            yield from decide(undecided.popleft())
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if signatures is not None and signatures.dirty:
+            signatures.save()
+
+
+def find_empty_folders(
+    path: str,
+    del_trash_files: bool = False,
+    rules: Optional[ScanRules] = None,
+    signatures: Optional[TrashSignatureStore] = None,
+    workers: int = DEFAULT_HASH_WORKERS,
+) -> List[str]:
+    """
+    Фактически пустые папки (самые верхние) и мусорные файлы (если del_trash_files) под path.
+    Поддеревья, отсечённые rules (например, белый список), не читаются.
+    Файл открывается, только если его размер совпал с сигнатурой мусора;
+    такие файлы проверяются в workers потоках.
+    """
+    return list(iter_empty_folders(path, del_trash_files, rules, signatures, workers))
@@ -1,25 +1,72 @@
 import os
 import pprint
-from typing import List, Tuple
+from collections import deque
+from typing import Callable, Dict, Generator, List, Optional, Set, Tuple
 
-EXCLUDES: List[str] = ["!new"]
+from scripts.folder_index import FUZZY_LIMIT, FolderIndex, get_folder_index, iter_index_folders, peek_folder_index, store_folder_index
+from scripts.folder_query import parse_query
+from scripts.scan_rules import ScanRules
+from scripts.search_cache import SearchCache, query_parts
+
+EXCLUDES: ScanRules = ScanRules(exclude_names=["!new"])
 PATHS: List[str] = [
     r"E:\Video", 
     r"E:\GIFS"
 ]
 
 
-def check_excludes(dirpath: str, excludes: List[str]) -> bool:
-    return any(exclude in dirpath for exclude in excludes)
+class AhoCorasick:
+    """
+    Автомат Ахо-Корасик для поиска сразу нескольких подстрок за один проход по тексту.
+    match() возвращает номера шаблонов, которые встретились в тексте.
+    """
+
+    def __init__(self, patterns: List[str]) -> None:
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Set[int]] = [set()]
+
+        for number, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(set())
+                state = next_state
+            self.output[state].add(number)
+
+        queue: deque = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail_state = self.fail[state]
+                while fail_state and char not in self.goto[fail_state]:
+                    fail_state = self.fail[fail_state]
+                self.fail[next_state] = self.goto[fail_state].get(char, 0)
+                self.output[next_state] |= self.output[self.fail[next_state]]
 
+    def match(self, text: str) -> Set[int]:
+        matched: Set[int] = set()
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                matched |= output[state]
+        return matched
 
-def find_folder_name(folder_name: str, excludes: List[str]) -> List[str]:
+
+def find_folder_name(folder_name: str, rules: ScanRules) -> List[str]:
     query: List[str] = []
     for path in PATHS:
-        for dirpath, folders, _ in os.walk(path):
-            if check_excludes(dirpath, excludes):
-                continue
-            
+        for dirpath, folders, _ in rules.walk(path):
             if dirpath != path:
                 query.extend(
                     os.path.join(dirpath, folder)
@@ -29,12 +76,131 @@ def find_folder_name(folder_name: str, excludes: List[str]) -> List[str]:
     return query
 
 
-def find_and_open_folder(folder_name: str) -> Tuple[str, List[str]]:
+def iter_folder_names(
+    folder_names: List[str],
+    rules: ScanRules,
+    is_cancelled: Callable[[], bool] = lambda: False,
+    walked: Optional[List[str]] = None,
+) -> Generator[Tuple[str, Set[int]], None, None]:
+    """
+    Как find_folder_name, но для всех частей запроса за один обход каждого корня.
+    Отдаёт (папка, номера частей запроса, которые есть в её имени) по мере обхода.
+    Если передан walked, туда складываются все пройденные папки.
+    """
+    matcher: AhoCorasick = AhoCorasick([folder_name.lower() for folder_name in folder_names])
+    for folder in iter_index_folders(PATHS, rules, is_cancelled):
+        if walked is not None:
+            walked.append(folder)
+        matched = matcher.match(os.path.basename(folder).lower())
+        if matched:
+            yield folder, matched
+
+
+def find_folder_names(folder_names: List[str], rules: ScanRules) -> Dict[str, Set[int]]:
+    return dict(iter_folder_names(folder_names, rules))
+
+
+def rank_folders(hits: Dict[str, Set[int]]) -> List[str]:
+    """Папки, совпавшие с большим числом частей запроса, идут первыми."""
+    return sorted(hits, key=lambda folder: len(hits[folder]), reverse=True)
+
+
+def rebuild_folder_index() -> FolderIndex:
+    return get_folder_index(PATHS, EXCLUDES, rebuild=True)
+
+
+def find_and_open_folder(folder_name: str, use_index: bool = True) -> Tuple[str, List[str]]:
+    folder_name = os.path.basename(folder_name)
+    sub_folder_names: List[str] = query_parts(folder_name)
+
+    if use_index:
+        index: FolderIndex = get_folder_index(PATHS, EXCLUDES)
+        hits: Dict[str, Set[int]] = {}
+        for number, sub_folder_name in enumerate(sub_folder_names):
+            for folder in index.search_substring(sub_folder_name):
+                hits.setdefault(folder, set()).add(number)
+    else:
+        hits = find_folder_names(sub_folder_names, EXCLUDES)
+
+    return (folder_name, rank_folders(hits))
+
+
+def tree_generation() -> str:
+    """
+    Поколение дерева папок: версия индекса (время построения и число изменений)
+    плюс mtime корней. Меняется, когда меняется то, по чему ищем.
+    """
+    parts: List[str] = []
+    index: Optional[FolderIndex] = peek_folder_index(PATHS)
+    if index is not None:
+        parts.append(f"{index.built_at:.0f}.{index.generation}")
+    for path in PATHS:
+        try:
+            parts.append(str(os.stat(path).st_mtime_ns))
+        except OSError:
+            parts.append("-")
+    return ":".join(parts)
+
+
+def iter_find_and_open_folder(
+    folder_name: str,
+    is_cancelled: Callable[[], bool] = lambda: False,
+    cache: Optional[SearchCache] = None,
+) -> Generator[str, None, None]:
+    """
+    Потоковая версия find_and_open_folder для поиска по мере ввода.
+    Без индекса папки отдаются по ходу обхода, а после полного обхода из него строится индекс.
+    Если передан cache, повторный запрос при неизменном дереве отдаётся из него.
+    """
     folder_name = os.path.basename(folder_name)
-    folders: List[str] = []
+    sub_folder_names: List[str] = query_parts(folder_name)
+    if not sub_folder_names:
+        return
+
+    if cache is not None:
+        cached: Optional[List[str]] = cache.get(folder_name, tree_generation())
+        if cached is not None:
+            yield from cached
+            return
+
+    found: List[str] = []
+    if peek_folder_index(PATHS) is not None:
+        found = find_and_open_folder(folder_name)[1]
+        yield from found
+    else:
+        walked: List[str] = []
+        for folder, _ in iter_folder_names(sub_folder_names, EXCLUDES, is_cancelled, walked):
+            found.append(folder)
+            yield folder
+
+        if is_cancelled():
+            return
+        store_folder_index(FolderIndex(PATHS, walked))
+
+    if cache is not None and not is_cancelled():
+        cache.put(folder_name, tree_generation(), found)
+
+
+def fuzzy_find_folder(folder_name: str, limit: int = FUZZY_LIMIT) -> List[Tuple[str, float]]:
+    """
+    Поиск с опечатками по индексу: для каждой части запроса лучшие совпадения rapidfuzz.
+    Для папки берётся лучшая оценка среди частей.
+    """
+    folder_name = os.path.basename(folder_name)
+    index: FolderIndex = get_folder_index(PATHS, EXCLUDES)
+    scores: Dict[str, float] = {}
     for sub_folder_name in folder_name.split("+"):
-        folders.extend(find_folder_name(sub_folder_name, EXCLUDES))
-    
-    
-    return (folder_name, list(set(folders)))
+        for folder, score in index.fuzzy_search(sub_folder_name, limit):
+            scores[folder] = max(score, scores.get(folder, 0))
+
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
 
+def query_folders(query: str) -> List[str]:
+    """
+    Структурированный запрос (см. folder_query.parse_query) по индексу и stats папок в памяти.
+    """
+    node = parse_query(query)
+    index: FolderIndex = get_folder_index(PATHS, EXCLUDES)
+    index.ensure_stats(EXCLUDES)
+    return sorted(node.evaluate(index))
@@ -0,0 +1,509 @@
+import json
+import os
+import threading
+import time
+from array import array
+from typing import Callable, Dict, Generator, Iterable, List, Optional, Set, Tuple
+
+from rapidfuzz import fuzz, process
+
+from scripts.deleter_empty_folder_and_more import fix_folder_name
+from scripts.scan_rules import ScanRules
+
+INDEX_FILE: str = "folder_index.json"
+INDEX_VERSION: int = 2
+NGRAM_SIZE: int = 3
+NGRAM_VERIFY_LIMIT: int = 256
+FUZZY_LIMIT: int = 30
+FUZZY_SCORE_CUTOFF: float = 75
+
+
+def iter_index_folders(
+    roots: List[str],
+    rules: ScanRules,
+    is_cancelled: Callable[[], bool] = lambda: False,
+) -> Generator[str, None, None]:
+    """
+    Папки, которые попадают в индекс: всё глубже первого уровня корней,
+    кроме поддеревьев, отсечённых rules (как в find_folder.find_folder_name).
+    """
+    for root in roots:
+        for dirpath, folders, _ in rules.walk(root):
+            if is_cancelled():
+                return
+            if dirpath != root:
+                for folder in folders:
+                    yield os.path.join(dirpath, folder)
+
+
+def is_index_folder(folder: str, roots: List[str], rules: Optional[ScanRules] = None) -> bool:
+    """
+    Попадает ли папка в индекс по тем же правилам, что и iter_index_folders.
+    Без rules проверяется только глубина, для папок из уже отсечённого обхода.
+    """
+    parent = os.path.dirname(folder)
+    if not any(parent != root and parent.startswith(os.path.join(root, "")) for root in roots):
+        return False
+    return rules is None or not rules.is_excluded(folder)
+
+
+def scan_folder_stats(
+    top: str,
+    stats: Dict[str, List[float]],
+    order: Optional[List[str]] = None,
+    rules: Optional[ScanRules] = None,
+) -> List[float]:
+    """
+    Рекурсивные [число файлов, размер в байтах, последний mtime] для top и всех папок под ним за один обход.
+    Результат для каждой папки кладётся в stats, а сами подпапки в order - в том же порядке, что у os.walk.
+    Поддеревья, отсечённые rules, не читаются и в stats не учитываются.
+    """
+    files, size = 0, 0
+    try:
+        mtime = os.stat(top).st_mtime
+    except OSError:
+        mtime = 0.0
+
+    subfolders: List[str] = []
+    try:
+        with os.scandir(top) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink() and not (rules is not None and rules.prune(entry.path, entry.name)):
+                            subfolders.append(entry.path)
+                    else:
+                        entry_stat = entry.stat()
+                        files += 1
+                        size += entry_stat.st_size
+                        mtime = max(mtime, entry_stat.st_mtime)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+
+    if order is not None:
+        order.extend(subfolders)
+    for subfolder in subfolders:
+        sub_files, sub_size, sub_mtime = scan_folder_stats(subfolder, stats, order, rules)
+        files += sub_files
+        size += sub_size
+        mtime = max(mtime, sub_mtime)
+
+    stats[top] = [files, size, mtime]
+    return stats[top]
+
+
+def split_tokens(folder: str) -> Set[str]:
+    """
+    Разбивает имя папки по "+" и нормализует каждую часть так же, как fix_folder_name.
+    """
+    return {token for token in map(fix_folder_name, os.path.basename(folder).split("+")) if token}
+
+
+def best_tokens(query: str, token_list: List[str], score_cutoff: float, limit: int) -> List[Tuple[str, float]]:
+    """
+    limit токенов с лучшей оценкой fuzz.QRatio не ниже score_cutoff, лучшие первыми.
+    QRatio сравнивает строки целиком: у WRatio короткий токен, входящий в запрос ("k" в "sakrua"),
+    получает 90 и оказывается выше настоящего совпадения с опечаткой.
+    Оценки считает rapidfuzz.process.cdist на всех ядрах; cdist нужен numpy, без него - process.extract.
+    У каждого токена есть хотя бы одна папка, так что limit лучших токенов хватает на limit папок.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        matched = process.extract(query, token_list, scorer=fuzz.QRatio, score_cutoff=score_cutoff, limit=limit)
+        return [(token, float(score)) for token, score, _ in matched]
+
+    scores = process.cdist([query], token_list, scorer=fuzz.QRatio, score_cutoff=score_cutoff, workers=-1)[0]
+    matched = np.flatnonzero(scores)
+    matched = matched[np.argsort(-scores[matched], kind="stable")][:limit]
+    return [(token_list[token_number], float(scores[token_number])) for token_number in matched]
+
+
+class NGramIndex:
+    """
+    Индекс n-грамм по именам папок в нижнем регистре.
+
+    Кандидаты получаются пересечением списков позиций самых редких n-грамм запроса,
+    затем каждый кандидат проверяется через `query in name`, поэтому семантика
+    совпадает с обычным поиском подстроки.
+    """
+
+    def __init__(self, n: int = NGRAM_SIZE) -> None:
+        self.n: int = n
+        self.names: List[Optional[str]] = []
+        self.postings: Dict[str, array] = {}
+
+    def grams(self, text: str) -> Set[str]:
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def add(self, position: int, name: str) -> None:
+        """Позиции должны добавляться по возрастанию, тогда списки остаются отсортированными."""
+        while len(self.names) < position:
+            self.names.append(None)
+
+        name = name.lower()
+        self.names.append(name)
+        for gram in self.grams(name):
+            self.postings.setdefault(gram, array("I")).append(position)
+
+    def remove(self, position: int) -> None:
+        self.names[position] = None
+
+    def search(self, query: str) -> List[int]:
+        query = query.lower()
+        if not query:
+            return []
+
+        grams = self.grams(query)
+        if not grams:
+            return [position for position, name in enumerate(self.names) if name is not None and query in name]
+
+        postings = [self.postings.get(gram) for gram in grams]
+        if any(posting is None for posting in postings):
+            return []
+        postings.sort(key=len)
+
+        candidates: Set[int] = set(postings[0])
+        for posting in postings[1:]:
+            if len(candidates) <= NGRAM_VERIFY_LIMIT:
+                break
+            candidates.intersection_update(posting)
+
+        return sorted(
+            position
+            for position in candidates
+            if (name := self.names[position]) is not None and query in name
+        )
+
+
+class FolderIndex:
+    """
+    Инвертированный индекс: нормализованный токен артиста -> папки, в названии которых он есть.
+
+    Папки хранятся в списке, токены ссылаются на позиции в нём.
+    Удалённые папки остаются в списке как None до следующего save().
+    Для каждой папки хранятся stats: [число файлов, размер в байтах, последний mtime] всего поддерева.
+    Изменения и поиск защищены lock, индекс можно обновлять из GUI-потока,
+    пока воркеры ищут по нему.
+    """
+
+    def __init__(self, roots: Iterable[str], folders: Iterable[str] = (), generation: int = 0) -> None:
+        self.roots: List[str] = list(roots)
+        self.folders: List[Optional[str]] = []
+        self.positions: Dict[str, int] = {}
+        self.tokens: Dict[str, Set[int]] = {}
+        self.stats: Dict[str, List[float]] = {}
+        self.generation: int = generation
+        self.built_at: float = time.time()
+        self._ngrams: Optional[NGramIndex] = None
+        self._token_list: List[str] = []
+        self._token_list_generation: Optional[int] = None
+        self._children: Optional[Dict[str, Set[str]]] = None
+        self.lock: threading.RLock = threading.RLock()
+
+        for folder in folders:
+            self._add(folder)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def _add(self, folder: str) -> int:
+        position = len(self.folders)
+        self.folders.append(folder)
+        self.positions[folder] = position
+        for token in split_tokens(folder):
+            self.tokens.setdefault(token, set()).add(position)
+        if self._ngrams is not None:
+            self._ngrams.add(position, os.path.basename(folder))
+        if self._children is not None:
+            self._children.setdefault(os.path.dirname(folder), set()).add(folder)
+        return position
+
+    def add_folder(self, folder: str) -> bool:
+        with self.lock:
+            if folder in self.positions:
+                return False
+            self._add(folder)
+            self.generation += 1
+            return True
+
+    def remove_folder(self, folder: str) -> bool:
+        with self.lock:
+            return self._remove(folder)
+
+    def _remove(self, folder: str) -> bool:
+        position = self.positions.pop(folder, None)
+        if position is None:
+            return False
+
+        for token in split_tokens(folder):
+            posting = self.tokens.get(token)
+            if posting is None:
+                continue
+            posting.discard(position)
+            if not posting:
+                del self.tokens[token]
+
+        self.folders[position] = None
+        self.stats.pop(folder, None)
+        if self._ngrams is not None:
+            self._ngrams.remove(position)
+        if self._children is not None:
+            siblings = self._children.get(os.path.dirname(folder))
+            if siblings is not None:
+                siblings.discard(folder)
+                if not siblings:
+                    del self._children[os.path.dirname(folder)]
+        self.generation += 1
+        return True
+
+    def children(self, parent: str) -> Set[str]:
+        """Проиндексированные папки, лежащие прямо в parent."""
+        with self.lock:
+            if self._children is None:
+                self._children = {}
+                for folder in self.positions:
+                    self._children.setdefault(os.path.dirname(folder), set()).add(folder)
+            return set(self._children.get(parent, ()))
+
+    def add_tree(self, top: str, rules: ScanRules) -> int:
+        """Добавляет top и все папки под ним, которые должны быть в индексе. Возвращает число добавленных."""
+        if rules.is_excluded(top):
+            return 0
+
+        stats: Dict[str, List[float]] = {}
+        order: List[str] = []
+        scan_folder_stats(top, stats, order, rules)
+        return self.apply_tree(top, stats, order)
+
+    def apply_tree(self, top: str, stats: Dict[str, List[float]], order: List[str]) -> int:
+        """Вторая половина add_tree: добавляет уже просканированное поддерево, диск не читается."""
+        added = 0
+        with self.lock:
+            for folder in [top, *order]:
+                if is_index_folder(folder, self.roots):
+                    added += self.add_folder(folder)
+            self._apply_stats(top, stats)
+        return added
+
+    def remove_tree(self, top: str) -> int:
+        """Удаляет top и все проиндексированные папки под ним. Возвращает число удалённых."""
+        removed = 0
+        with self.lock:
+            previous = self.stats.get(top)
+            stack: List[str] = [top]
+            while stack:
+                folder = stack.pop()
+                stack.extend(self.children(folder))
+                removed += self._remove(folder)
+            if previous is not None:
+                self._propagate_stats(top, -previous[0], -previous[1])
+        return removed
+
+    def refresh_stats(self, top: str, rules: ScanRules) -> bool:
+        """Пересчитывает stats для top и папок под ним, например после изменения файлов в top."""
+        stats: Dict[str, List[float]] = {}
+        scan_folder_stats(top, stats, rules=rules)
+        return self.apply_stats(top, stats)
+
+    def apply_stats(self, top: str, stats: Dict[str, List[float]]) -> bool:
+        """Вторая половина refresh_stats: записывает уже посчитанные stats, диск не читается."""
+        with self.lock:
+            return self._apply_stats(top, stats)
+
+    def ensure_stats(self, rules: ScanRules) -> None:
+        """Досчитывает stats, если индекс собран без них (например, потоковым поиском)."""
+        if len(self.stats) >= len(self.positions):
+            return
+
+        stats: Dict[str, List[float]] = {}
+        for root in self.roots:
+            if os.path.isdir(root):
+                scan_folder_stats(root, stats, rules=rules)
+
+        with self.lock:
+            for folder in self.positions:
+                self.stats.setdefault(folder, stats.get(folder, [0, 0, 0.0]))
+
+    def _apply_stats(self, top: str, stats: Dict[str, List[float]]) -> bool:
+        """Записывает stats проиндексированных папок поддерева и переносит разницу для top на его предков."""
+        previous = self.stats.get(top)
+        for folder, folder_stats in stats.items():
+            if folder in self.positions:
+                self.stats[folder] = folder_stats
+        if previous == stats[top]:
+            return False
+
+        previous = previous or [0, 0, 0.0]
+        self._propagate_stats(top, stats[top][0] - previous[0], stats[top][1] - previous[1])
+        return True
+
+    def _propagate_stats(self, folder: str, files: int, size: int) -> None:
+        now = time.time()
+        parent = os.path.dirname(folder)
+        while parent in self.stats and parent != folder:
+            parent_stats = self.stats[parent]
+            self.stats[parent] = [parent_stats[0] + files, parent_stats[1] + size, max(parent_stats[2], now)]
+            folder, parent = parent, os.path.dirname(parent)
+
+    def lookup(self, token: str) -> List[str]:
+        """Папки, у которых есть ровно такой токен."""
+        return [self.folders[position] for position in sorted(self.tokens.get(fix_folder_name(token), ()))]
+
+    def search(self, query: str) -> List[str]:
+        """
+        Папки, в токенах которых встречается query как подстрока.
+        Сканируется только словарь токенов, а не все папки.
+        """
+        query = fix_folder_name(query)
+        if not query:
+            return []
+
+        positions: Set[int] = set()
+        with self.lock:
+            for token, posting in self.tokens.items():
+                if query in token:
+                    positions.update(posting)
+            return [self.folders[position] for position in sorted(positions)]
+
+    def search_substring(self, query: str) -> List[str]:
+        """
+        Папки, в имени которых есть query без учёта регистра, как в find_folder_name.
+        Индекс n-грамм строится при первом вызове.
+        """
+        with self.lock:
+            if self._ngrams is None:
+                self._ngrams = NGramIndex()
+                for position, folder in enumerate(self.folders):
+                    if folder is not None:
+                        self._ngrams.add(position, os.path.basename(folder))
+
+            return [self.folders[position] for position in self._ngrams.search(query)]
+
+    def fuzzy_search(
+        self,
+        query: str,
+        limit: int = FUZZY_LIMIT,
+        score_cutoff: float = FUZZY_SCORE_CUTOFF,
+    ) -> List[Tuple[str, float]]:
+        """
+        Папки, токены которых похожи на query с учётом опечаток, с оценкой rapidfuzz, лучшие первыми.
+        Оценивается только словарь токенов в памяти, диск не читается.
+        """
+        query = fix_folder_name(query)
+        if not query or not self.tokens:
+            return []
+
+        with self.lock:
+            if self._token_list_generation != self.generation:
+                self._token_list = list(self.tokens)
+                self._token_list_generation = self.generation
+            token_list: List[str] = self._token_list
+
+        results: Dict[str, float] = {}
+        with self.lock:
+            for token, score in best_tokens(query, token_list, score_cutoff, limit):
+                for position in sorted(self.tokens.get(token, ())):
+                    results.setdefault(self.folders[position], float(score))
+                if len(results) >= limit:
+                    break
+        return list(results.items())[:limit]
+
+    @classmethod
+    def build(cls, roots: List[str], rules: ScanRules) -> "FolderIndex":
+        """Строит индекс и stats папок за один обход корней."""
+        stats: Dict[str, List[float]] = {}
+        order: List[str] = []
+        for root in roots:
+            if os.path.isdir(root) and not rules.is_excluded(root):
+                scan_folder_stats(root, stats, order, rules)
+
+        index = cls(roots, (folder for folder in order if is_index_folder(folder, roots)))
+        index.stats = {folder: stats[folder] for folder in index.positions}
+        return index
+
+    def save(self, path: str = INDEX_FILE) -> None:
+        with self.lock:
+            folders = [folder for folder in self.folders if folder is not None]
+            if len(folders) != len(self.folders):
+                compacted = FolderIndex(self.roots, folders, self.generation)
+                self.folders, self.positions, self.tokens = compacted.folders, compacted.positions, compacted.tokens
+                self._ngrams = None
+                self._children = None
+
+            data = {
+                "version": INDEX_VERSION,
+                "roots": self.roots,
+                "generation": self.generation,
+                "built_at": self.built_at,
+                "folders": list(self.folders),
+                "tokens": {token: sorted(posting) for token, posting in self.tokens.items()},
+                "stats": [self.stats.get(folder) for folder in self.folders],
+            }
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_FILE) -> Optional["FolderIndex"]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (IOError, json.JSONDecodeError):
+            return None
+
+        if data.get("version") != INDEX_VERSION:
+            return None
+
+        index = cls(data["roots"], generation=data.get("generation", 0))
+        index.built_at = data.get("built_at", 0.0)
+        index.folders = data["folders"]
+        index.positions = {folder: position for position, folder in enumerate(index.folders)}
+        index.tokens = {token: set(posting) for token, posting in data["tokens"].items()}
+        index.stats = {
+            folder: folder_stats
+            for folder, folder_stats in zip(index.folders, data.get("stats", ()))
+            if folder_stats is not None
+        }
+        return index
+
+
+_folder_index: Optional[FolderIndex] = None
+_folder_index_lock: threading.Lock = threading.Lock()
+
+
+def peek_folder_index(roots: List[str]) -> Optional[FolderIndex]:
+    """Индекс из памяти или с диска, без построения нового."""
+    global _folder_index
+
+    with _folder_index_lock:
+        if _folder_index is None:
+            _folder_index = FolderIndex.load()
+        if _folder_index is not None and _folder_index.roots == list(roots):
+            return _folder_index
+        return None
+
+
+def store_folder_index(index: FolderIndex) -> FolderIndex:
+    global _folder_index
+
+    with _folder_index_lock:
+        index.save()
+        _folder_index = index
+        return index
+
+
+def get_folder_index(roots: List[str], rules: ScanRules, rebuild: bool = False) -> FolderIndex:
+    """
+    Возвращает индекс из памяти, с диска или строит новый, если корни изменились или rebuild=True.
+    """
+    if not rebuild:
+        index = peek_folder_index(roots)
+        if index is not None:
+            return index
+
+    return store_folder_index(FolderIndex.build(roots, rules))
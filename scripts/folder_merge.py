@@ -0,0 +1,124 @@
+import errno
+import os
+import shutil
+from dataclasses import dataclass
+from enum import Enum
+from typing import List
+
+from scripts.trash_signatures import file_signature
+
+
+class ConflictPolicy(Enum):
+    SKIP = "skip"
+    KEEP_BOTH = "keep_both"
+    REPLACE_IF_IDENTICAL = "replace_if_identical"
+
+
+class MergeAction(Enum):
+    MOVED = "moved"
+    MERGED = "merged"
+    SKIPPED = "skipped"
+    KEPT_BOTH = "kept_both"
+    IDENTICAL = "identical"
+    ERROR = "error"
+
+
+@dataclass
+class MergeResult:
+    source: str
+    destination: str
+    action: MergeAction
+    message: str = ""
+
+    def __str__(self) -> str:
+        text = f"{self.action.value}: {self.source} -> {self.destination}"
+        return f"{text} ({self.message})" if self.message else text
+
+
+def is_identical(first: str, second: str) -> bool:
+    """Одинаковые ли файлы: сначала размер, затем хэш префикса и полный md5."""
+    try:
+        if os.path.getsize(first) != os.path.getsize(second):
+            return False
+        return file_signature(first) == file_signature(second)
+    except OSError:
+        return False
+
+
+def free_name(path: str) -> str:
+    """Первое свободное имя вида "name (1).ext" рядом с path."""
+    root, ext = os.path.splitext(path)
+    number = 1
+    while os.path.lexists(f"{root} ({number}){ext}"):
+        number += 1
+    return f"{root} ({number}){ext}"
+
+
+def move_entry(source: str, destination: str) -> None:
+    """Переименование на том же диске, копирование с удалением - только между дисками."""
+    if os.path.lexists(destination):
+        raise FileExistsError(errno.EEXIST, "Destination already exists", destination)
+    try:
+        os.rename(source, destination)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(source, destination)
+
+
+def merge_folders(
+    source_dir: str,
+    destination_dir: str,
+    policy: ConflictPolicy = ConflictPolicy.REPLACE_IF_IDENTICAL,
+    fake_delete: bool = False,
+) -> List[MergeResult]:
+    """
+    Переносит содержимое source_dir в destination_dir и возвращает результат по каждому элементу.
+
+    Элементы без пары переносятся целиком одним переименованием, совпавшие папки сливаются рекурсивно,
+    а совпавшие файлы решаются по policy: SKIP оставляет файл в source_dir, KEEP_BOTH переносит его
+    под свободным именем, REPLACE_IF_IDENTICAL удаляет его из source_dir только если он совпадает
+    с файлом назначения по размеру и хэшу, иначе оставляет. Файл назначения никогда не перезаписывается.
+    Опустевшие папки source_dir удаляются.
+    """
+    results: List[MergeResult] = []
+    if not fake_delete:
+        os.makedirs(destination_dir, exist_ok=True)
+
+    try:
+        with os.scandir(source_dir) as entries:
+            entries = list(entries)
+    except OSError as e:
+        return [MergeResult(source_dir, destination_dir, MergeAction.ERROR, str(e))]
+
+    for entry in entries:
+        source = entry.path
+        destination = os.path.join(destination_dir, entry.name)
+        try:
+            if not os.path.lexists(destination):
+                if not fake_delete:
+                    move_entry(source, destination)
+                results.append(MergeResult(source, destination, MergeAction.MOVED))
+            elif entry.is_dir(follow_symlinks=False) and os.path.isdir(destination) and not os.path.islink(destination):
+                results.extend(merge_folders(source, destination, policy, fake_delete))
+                results.append(MergeResult(source, destination, MergeAction.MERGED))
+            elif policy == ConflictPolicy.KEEP_BOTH:
+                destination = free_name(destination)
+                if not fake_delete:
+                    move_entry(source, destination)
+                results.append(MergeResult(source, destination, MergeAction.KEPT_BOTH))
+            elif policy == ConflictPolicy.REPLACE_IF_IDENTICAL and entry.is_file(follow_symlinks=False) and is_identical(source, destination):
+                if not fake_delete:
+                    os.remove(source)
+                results.append(MergeResult(source, destination, MergeAction.IDENTICAL))
+            else:
+                results.append(MergeResult(source, destination, MergeAction.SKIPPED, "name conflict"))
+        except OSError as e:
+            results.append(MergeResult(source, destination, MergeAction.ERROR, str(e)))
+
+    if not fake_delete:
+        try:
+            os.rmdir(source_dir)
+        except OSError:
+            pass
+    return results
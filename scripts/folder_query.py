@@ -0,0 +1,252 @@
+import operator
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Union
+
+from scripts.folder_index import FolderIndex
+
+FIELDS: Dict[str, int] = {"files": 0, "size": 1, "age": 2}
+OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    "<=": operator.le,
+    ">=": operator.ge,
+    "<": operator.lt,
+    ">": operator.gt,
+    "=": operator.eq,
+}
+SIZE_UNITS: Dict[str, int] = {"": 1, "b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3, "tb": 1024 ** 4}
+AGE_UNITS: Dict[str, int] = {"": 86400, "h": 3600, "d": 86400, "w": 7 * 86400, "y": 365 * 86400}
+KEYWORDS: Set[str] = {"AND", "OR", "NOT"}
+
+TOKEN_RE = re.compile(
+    r'\s*(?:(?P<paren>[()])|"(?P<phrase>[^"]*)"'
+    r'|(?P<field>[A-Za-z]+)\s*(?P<op><=|>=|<|>|=)\s*(?P<value>[\d.]+)(?P<unit>[A-Za-z]*)'
+    r'|(?P<word>[^\s()"]+))'
+)
+STRUCTURED_RE = re.compile(r'\b(?:AND|OR|NOT)\b|\b(?:files|size|age)\s*(?:<=|>=|<|>|=)\s*[\d.]')
+
+
+def is_structured_query(text: str) -> bool:
+    """
+    Есть ли в запросе AND/OR/NOT или фильтр. Скобки и кавычки сами по себе не в счёт:
+    обычное имя вроде `artist (jp)` или брошенный путь ищутся как раньше.
+
+    >>> is_structured_query('artist (jp)'), is_structured_query('E:/Video/foo (bar)'), is_structured_query('foo files>20')
+    (False, False, True)
+    """
+    return bool(STRUCTURED_RE.search(text))
+
+
+@dataclass
+class Term:
+    """Папки, в имени которых есть text без учёта регистра."""
+    text: str
+
+    def evaluate(self, index: FolderIndex) -> Set[str]:
+        return set(index.search_substring(self.text))
+
+
+@dataclass
+class Filter:
+    """Сравнение stats папки: files > 20, size >= 1.5gb, age < 30d."""
+    name: str
+    op: str
+    value: float
+    now: float = field(default_factory=time.time, repr=False)
+
+    def matches(self, stats: List[float]) -> bool:
+        actual = stats[FIELDS[self.name]]
+        if self.name == "age":
+            actual = self.now - actual
+        return OPERATORS[self.op](actual, self.value)
+
+    def evaluate(self, index: FolderIndex) -> Set[str]:
+        with index.lock:
+            return {folder for folder, stats in index.stats.items() if self.matches(stats)}
+
+
+@dataclass
+class Not:
+    part: "Node"
+
+    def evaluate(self, index: FolderIndex) -> Set[str]:
+        with index.lock:
+            return set(index.positions) - self.part.evaluate(index)
+
+
+@dataclass
+class And:
+    """
+    Сначала пересекаются обычные части, затем результат фильтруется по stats
+    и из него вычитаются части с NOT, чтобы не строить множество всех папок.
+    """
+    parts: List["Node"]
+
+    def evaluate(self, index: FolderIndex) -> Set[str]:
+        positive = [part for part in self.parts if not isinstance(part, (Filter, Not))]
+        filters = [part for part in self.parts if isinstance(part, Filter)]
+        negative = [part for part in self.parts if isinstance(part, Not)]
+
+        with index.lock:
+            if positive:
+                result = positive[0].evaluate(index)
+                for part in positive[1:]:
+                    if not result:
+                        break
+                    result &= part.evaluate(index)
+            elif filters:
+                result = filters.pop(0).evaluate(index)
+            else:
+                result = set(index.positions)
+
+            for part in filters:
+                result = {
+                    folder for folder in result
+                    if (stats := index.stats.get(folder)) is not None and part.matches(stats)
+                }
+            for part in negative:
+                if not result:
+                    break
+                result -= part.part.evaluate(index)
+            return result
+
+
+@dataclass
+class Or:
+    parts: List["Node"]
+
+    def evaluate(self, index: FolderIndex) -> Set[str]:
+        result: Set[str] = set()
+        for part in self.parts:
+            result |= part.evaluate(index)
+        return result
+
+
+Node = Union[Term, Filter, Not, And, Or]
+
+
+def word_node(word: str) -> Optional[Union[Term, "Or"]]:
+    """
+    Слово запроса ищется как в обычном поиске: от пути остаётся имя папки,
+    а части через "+" - это любая из них.
+    """
+    parts: List[Node] = [Term(part) for part in os.path.basename(word).split("+") if part.strip()]
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else Or(parts)
+
+
+def tokenize(text: str) -> List[Union[str, Term, Filter, Or]]:
+    """
+    >>> tokenize('artist_a AND NOT artist_b files>20 age<30d')
+    [Term(text='artist_a'), 'AND', 'NOT', Term(text='artist_b'), Filter(name='files', op='>', value=20.0), Filter(name='age', op='<', value=2592000.0)]
+    >>> tokenize('files>20 AND foo size >= 1.5gb')
+    [Filter(name='files', op='>', value=20.0), 'AND', Term(text='foo'), Filter(name='size', op='>=', value=1610612736.0)]
+    >>> tokenize('files>20 foo+bar')
+    [Filter(name='files', op='>', value=20.0), Or(parts=[Term(text='foo'), Term(text='bar')])]
+    >>> tokenize('files>20x')
+    Traceback (most recent call last):
+    ValueError: Invalid unit for files: 'x'
+    """
+    tokens: List[Union[str, Term, Filter, Or]] = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_RE.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Unexpected character at {position}: {text[position:]!r}")
+        position = match.end()
+
+        if match["paren"]:
+            tokens.append(match["paren"])
+        elif match["phrase"] is not None:
+            if match["phrase"].strip():
+                tokens.append(Term(match["phrase"]))
+        elif match["field"]:
+            tokens.append(parse_filter(match["field"], match["op"], match["value"], match["unit"]))
+        elif match["word"] in KEYWORDS:
+            tokens.append(match["word"])
+        else:
+            node = word_node(match["word"])
+            if node is not None:
+                tokens.append(node)
+    return tokens
+
+
+def parse_filter(name: str, op: str, value: str, unit: str) -> Filter:
+    name, unit = name.lower(), unit.lower()
+    if name not in FIELDS:
+        raise ValueError(f"Unknown field: {name!r}, expected one of {', '.join(FIELDS)}")
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"Invalid number for {name}: {value!r}")
+
+    units = {"size": SIZE_UNITS, "age": AGE_UNITS}.get(name, {"": 1})
+    if unit not in units:
+        raise ValueError(f"Invalid unit for {name}: {unit!r}")
+    return Filter(name, op, number * units[unit])
+
+
+def parse_query(text: str) -> Node:
+    """
+    Разбирает запрос вида: `artist_a AND NOT artist_b files>20 age<30d`.
+
+    Части без оператора между ними объединяются через AND, NOT сильнее AND, AND сильнее OR,
+    есть скобки и фразы в кавычках. Фильтры: files (число файлов), size (b/kb/mb/gb/tb),
+    age (h/d/w/y, по умолчанию дни) с операторами <, <=, >, >=, =.
+
+    >>> parse_query('artist_a AND NOT artist_b files>20 age<30d')
+    And(parts=[Term(text='artist_a'), Not(part=Term(text='artist_b')), Filter(name='files', op='>', value=20.0), Filter(name='age', op='<', value=2592000.0)])
+    >>> parse_query('(artist OR E:/Video/other+third) size>1gb')
+    And(parts=[Or(parts=[Term(text='artist'), Or(parts=[Term(text='other'), Term(text='third')])]), Filter(name='size', op='>', value=1073741824.0)])
+    """
+    tokens = tokenize(text)
+    position = 0
+
+    def peek() -> Union[str, Term, Filter, Or, None]:
+        return tokens[position] if position < len(tokens) else None
+
+    def parse_or() -> Node:
+        nonlocal position
+        parts = [parse_and()]
+        while peek() == "OR":
+            position += 1
+            parts.append(parse_and())
+        return parts[0] if len(parts) == 1 else Or(parts)
+
+    def parse_and() -> Node:
+        nonlocal position
+        parts = [parse_not()]
+        while peek() not in (None, "OR", ")"):
+            if peek() == "AND":
+                position += 1
+            parts.append(parse_not())
+        return parts[0] if len(parts) == 1 else And(parts)
+
+    def parse_not() -> Node:
+        nonlocal position
+        if peek() == "NOT":
+            position += 1
+            return Not(parse_not())
+        return parse_atom()
+
+    def parse_atom() -> Node:
+        nonlocal position
+        token = peek()
+        position += 1
+        if token == "(":
+            node = parse_or()
+            if peek() != ")":
+                raise ValueError("Missing closing parenthesis")
+            position += 1
+            return node
+        if isinstance(token, (Term, Filter, Or)):
+            return token
+        raise ValueError(f"Unexpected {token or 'end of query'!r}")
+
+    node = parse_or()
+    if peek() is not None:
+        raise ValueError(f"Unexpected {peek()!r}")
+    return node
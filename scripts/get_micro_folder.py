@@ -2,6 +2,8 @@ import os
 from typing import List, Dict
 import shutil
 
+from scripts.scan_rules import ScanRules
+
 PATHS: List[str] = [
     r"E:\Video", 
     r"E:\GIFS"
@@ -9,13 +11,13 @@ PATHS: List[str] = [
 
 SMALL_FILE_COUNT_FOLDER: str = "!SmallFileCount"
 EXCLUDE_FOLDERS: List[str] = ["!new", SMALL_FILE_COUNT_FOLDER]
+SCAN_RULES: ScanRules = ScanRules(exclude_names=EXCLUDE_FOLDERS)
 
 
 def get_filtered_folders(paths: List[str], min_file_count: int = 5) -> Dict[str, int]:
     filtered_folders: Dict[str, int] = {}
     for path in paths:
-        for root, dirs, files in os.walk(path):
-            dirs[:] = [dir for dir in dirs if dir not in EXCLUDE_FOLDERS]
+        for root, dirs, files in SCAN_RULES.walk(path):
             if not dirs:
                 file_count: int = len(files)
                 if file_count <= min_file_count:
@@ -1,10 +1,16 @@
 import os
+import random
 import re
 import shutil
-from typing import Generator, List, Dict, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 from dataclasses import dataclass
 
-from fuzzywuzzy import fuzz
+from rapidfuzz import fuzz, process
+
+from scripts.gsaf_decisions import DecisionStore, pair_key
+from scripts.pair_blocking import BlockingIndex
+from scripts.pair_score_cache import ARTIST, FOLDER, PairScoreCache
+from scripts.scan_rules import ScanRules
 
 PATHS = [
     "E:\\Video",
@@ -17,6 +23,13 @@ KNOW_NAMES_DIR = "!KNOW_NAMES"
 OTHERS_DIR = ["!Others", "!Other"]
 CENSORED_TAG = "[Censored]"
 SIMILARITY_THRESHOLD = 80
+SCORE_CHUNK_ROWS = 1024
+FULL_MATRIX_MAX_PAIRS = 2_000_000
+BLOCKING_MIN_RECALL = 0.99
+RECALL_SAMPLE_ROWS = 200
+SCORER_VERSION = "token_set_ratio/full_process/1"
+EXCLUDED_RULES = ScanRules(exclude_names=EXCLUDED_DIRS)
+OTHERS_RULES = ScanRules(exclude_names=OTHERS_DIR)
 
 
 @dataclass
@@ -27,28 +40,24 @@ class Match:
     similarity: int
 
 
+@dataclass
+class Candidate:
+    """Пограничная пара, по которой нужно решение; matches - все совпадения, которые она даст."""
+    original_folder_name: str
+    artist_name: str
+    similarity: int
+    pair: Tuple[str, str]
+    matches: List[Match]
+
 
 def get_folders_list(path: str) -> List[str]:
     """
     Получает список всех папок в директории уже существующих папок, исключая EXCLUDED_DIRS.
     """
     result = []
-    first_level_folders = [
-        item
-        for item in os.listdir(path)
-        if os.path.isdir(os.path.join(path, item)) and item not in EXCLUDED_DIRS
-    ]
-
-    for folder in first_level_folders:
+    for folder in EXCLUDED_RULES.list_dirs(path):
         folder_path = os.path.join(path, folder)
-        result.extend(
-            [
-                (sub_item, folder_path)
-                for sub_item in os.listdir(folder_path)
-                if os.path.isdir(os.path.join(folder_path, sub_item))
-                and sub_item not in OTHERS_DIR
-            ]
-        )
+        result.extend((sub_item, folder_path) for sub_item in OTHERS_RULES.list_dirs(folder_path))
 
     return result
 
@@ -67,10 +76,7 @@ def get_new_folders_list(path: str) -> List[Tuple[str, str]]:
     Получаем список всех папок в директории новых папок.
     """
     new_path = os.path.join(path, NEW_DIR)
-    for root, dirs, _ in os.walk(new_path):
-        if root == new_path:
-            return [(item, new_path) for item in dirs]
-    return []
+    return [(item, new_path) for item in ScanRules().list_dirs(new_path)]
 
 
 def create_folders_dict(folders_list: List[str]) -> Dict[str, List[Tuple[str, str]]]:
@@ -108,88 +114,323 @@ def remove_artist_keyword(folder_name: str) -> str:
 
 
 def load_list(file_path: str) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
-    if not os.path.exists(file_path):
-        return set(), set()
-    
-    whitelist = set()
-    blacklist = set()
-    current_list = None
-
-    with open(file_path, "r") as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith("##"):
-                if "blacklist" in line:
-                    current_list = 'blacklist'
-                elif "whitelist" in line:
-                    current_list = 'whitelist'
-            elif line:
-                item = tuple(line.split(","))
-                if current_list == 'blacklist':
-                    blacklist.add(item)
-                elif current_list == 'whitelist':
-                    whitelist.add(item)
-
-    return list(whitelist), list(blacklist)
+    store = DecisionStore(file_path)
+    return store.whitelist(), store.blacklist()
 
 
 def save_to_list(file_path: str, folder: str, key: str, is_whitelist: bool) -> None:
-    whitelist, blacklist = load_list(file_path)
+    DecisionStore(file_path).add(folder, key, is_whitelist)
+    print(f"Added to {'whitelist' if is_whitelist else 'blacklist'}: {folder} - {key}")
 
-    if is_whitelist:
-        whitelist.append((folder, key))
-        print(f"Added to whitelist: {folder} - {key}")
-    else:
-        blacklist.append((folder, key))
-        print(f"Added to blacklist: {folder} - {key}")
-    
-    whitelist = list(set(whitelist))
-    blacklist = list(set(blacklist))
 
-    with open(file_path, "w") as f:
-        f.write("## blacklist\n")
-        for item in blacklist:
-            f.write(f"{item[0]},{item[1]}\n")
-        f.write("\n## whitelist\n")
-        for item in whitelist:
-            f.write(f"{item[0]},{item[1]}\n")
+def normalize_name(name: str) -> str:
+    """
+    Нормализация перед сравнением, как full_process в fuzzywuzzy: всё, кроме букв, цифр и "_", -
+    пробел, нижний регистр. "_" остаётся частью слова, чтобы "shirakami_san" не совпадало с "shirakami" на 100%.
+    """
+    return re.sub(r"\W", " ", name).lower().strip()
+
 
+def row_scores(query: str, choices: List[str] | Dict[int, str], score_cutoff: float = SIMILARITY_THRESHOLD) -> List[Tuple[int, int]]:
+    """
+    (номер choice, оценка token_set_ratio) не ниже score_cutoff для одной строки, по возрастанию номера.
+    choices - список имён или {номер: имя}; оценки округляются до целых, как в fuzzywuzzy.
+    """
+    scored = process.extract(query, choices, scorer=fuzz.token_set_ratio, score_cutoff=score_cutoff - 0.5, limit=None)
+    return sorted((column, int(round(score))) for _, score, column in scored)
 
-def compare_folders(
+
+def score_matrix(
+    queries: List[str],
+    choices: List[str],
+    score_cutoff: float = SIMILARITY_THRESHOLD,
+) -> Iterator[Tuple[int, int, int]]:
+    """
+    Все пары (номер query, номер choice, оценка token_set_ratio) с оценкой не ниже score_cutoff,
+    по строкам в порядке возрастания. Строки должны быть уже нормализованы (normalize_name).
+    Матрица считается rapidfuzz.process.cdist на всех ядрах кусками по SCORE_CHUNK_ROWS строк;
+    cdist нужен numpy, без него каждая строка оценивается отдельно через row_scores.
+    """
+    if not queries or not choices:
+        return
+
+    try:
+        import numpy as np
+    except ImportError:
+        for row, query in enumerate(queries):
+            for column, score in row_scores(query, choices, score_cutoff):
+                yield row, column, score
+        return
+
+    for start in range(0, len(queries), SCORE_CHUNK_ROWS):
+        scores = process.cdist(
+            queries[start:start + SCORE_CHUNK_ROWS],
+            choices,
+            scorer=fuzz.token_set_ratio,
+            score_cutoff=score_cutoff - 0.5,
+            workers=-1,
+        )
+        for row, column in zip(*np.nonzero(scores)):
+            yield start + int(row), int(column), int(round(float(scores[row, column])))
+
+
+def blocked_scores(
+    queries: List[str],
+    choices: List[str],
+    score_cutoff: float = SIMILARITY_THRESHOLD,
+    index: Optional[BlockingIndex] = None,
+) -> Iterator[Tuple[int, int, int]]:
+    """
+    То же, что score_matrix, но оцениваются только пары из общего блока BlockingIndex,
+    поэтому время растёт почти линейно от числа имён, а не как их произведение.
+    """
+    if index is None:
+        index = BlockingIndex(choices)
+    for row, query in enumerate(queries):
+        candidates = {column: choices[column] for column in index.candidates(query)}
+        if not candidates:
+            continue
+        for column, score in row_scores(query, candidates, score_cutoff):
+            yield row, column, score
+
+
+def blocking_recall(
+    queries: List[str],
+    choices: List[str],
+    score_cutoff: float = SIMILARITY_THRESHOLD,
+    index: Optional[BlockingIndex] = None,
+) -> float:
+    """Доля пар полного перебора (score_matrix), которые находит blocked_scores при том же пороге."""
+    expected = {(row, column) for row, column, _ in score_matrix(queries, choices, score_cutoff)}
+    if not expected:
+        return 1.0
+    found = {(row, column) for row, column, _ in blocked_scores(queries, choices, score_cutoff, index)}
+    return len(expected & found) / len(expected)
+
+
+def choose_blocking(
+    queries: List[str],
+    choices: List[str],
+    score_cutoff: float = SIMILARITY_THRESHOLD,
+) -> Optional[BlockingIndex]:
+    """
+    Индекс блоков для similar_pairs или None, если нужна полная матрица.
+
+    Пока пар не больше FULL_MATRIX_MAX_PAIRS, считается полная матрица. Иначе полнота блоков проверяется
+    на RECALL_SAMPLE_ROWS случайных строках: если blocking_recall ниже BLOCKING_MIN_RECALL,
+    пропускается меньше частых n-грамм (порог блока растёт в 4 раза), а когда блоки уже не дешевле
+    половины полной матрицы или пропускать больше нечего - считается полная матрица.
+    """
+    total_pairs = len(queries) * len(choices)
+    if total_pairs <= FULL_MATRIX_MAX_PAIRS:
+        return None
+
+    sample = random.Random(0).sample(queries, min(RECALL_SAMPLE_ROWS, len(queries)))
+    index = BlockingIndex(choices)
+    while True:
+        if index.pair_count(sample) * len(queries) / len(sample) >= total_pairs / 2:
+            return None
+        recall = blocking_recall(sample, choices, score_cutoff, index)
+        if recall >= BLOCKING_MIN_RECALL:
+            return index
+        if index.max_ngram_block >= len(choices):
+            return None
+        index.max_ngram_block *= 4
+
+
+def similar_pairs(
+    queries: List[str],
+    choices: List[str],
+    score_cutoff: float = SIMILARITY_THRESHOLD,
+) -> Iterator[Tuple[int, int, int]]:
+    """Полная матрица или только пары из общих блоков, смотря что выберет choose_blocking."""
+    index = choose_blocking(queries, choices, score_cutoff)
+    if index is None:
+        return score_matrix(queries, choices, score_cutoff)
+    return blocked_scores(queries, choices, score_cutoff, index)
+
+
+def open_pair_score_cache() -> PairScoreCache:
+    return PairScoreCache(SIMILARITY_THRESHOLD, SCORER_VERSION)
+
+
+def cached_similar_pairs(
+    queries: List[str],
+    choices: List[str],
+    cache: PairScoreCache,
+    score_cutoff: float = SIMILARITY_THRESHOLD,
+) -> List[Tuple[int, int, int]]:
+    """
+    То же, что similar_pairs, но пары уже известных имён берутся из cache, а оцениваются только
+    пары с новыми (или переименованными) папками и артистами.
+
+    Известным имя становится, только если все его пары посчитаны полной матрицей: за запуск так
+    проверяется не больше FULL_MATRIX_MAX_PAIRS пар, остальные новые имена оцениваются через
+    choose_blocking, попадают в результат, но в cache не записываются и в следующий раз считаются снова.
+    Так пары, потерянные блоками, не запоминаются как "ниже порога". После подсчёта cache содержит
+    только имена этого запуска.
+    """
+    folder_names: List[str] = list(dict.fromkeys(queries))
+    artist_names: List[str] = list(dict.fromkeys(choices))
+    known_folders = cache.known(FOLDER)
+    known_artists = cache.known(ARTIST)
+
+    folder_set, artist_set = set(folder_names), set(artist_names)
+    pair_scores: Dict[Tuple[str, str], int] = {
+        (folder, artist): score
+        for folder, artist, score in cache.scores()
+        if folder in folder_set and artist in artist_set
+    }
+
+    new_folders = [name for name in folder_names if name not in known_folders]
+    old_folders = [name for name in folder_names if name in known_folders]
+    new_artists = [name for name in artist_names if name not in known_artists]
+    verified_folders = set(old_folders)
+    verified_artists = {name for name in artist_names if name in known_artists}
+
+    fresh: List[Tuple[str, str, int]] = []
+
+    def score_pairs(folders: List[str], artists: List[str], exhaustive: bool) -> bool:
+        """Оценивает пары folders x artists; True, если посчитана полная матрица."""
+        index = None if exhaustive else choose_blocking(folders, artists, score_cutoff)
+        if index is None:
+            pairs = score_matrix(folders, artists, score_cutoff)
+        else:
+            pairs = blocked_scores(folders, artists, score_cutoff, index)
+        fresh.extend((folders[row], artists[column], similarity) for row, column, similarity in pairs)
+        return index is None
+
+    budget = FULL_MATRIX_MAX_PAIRS
+    count = min(len(new_folders), budget // max(1, len(artist_names)))
+    budget -= count * len(artist_names)
+    score_pairs(new_folders[:count], artist_names, exhaustive=True)
+    verified_folders.update(new_folders[:count])
+    if score_pairs(new_folders[count:], artist_names, exhaustive=False):
+        verified_folders.update(new_folders[count:])
+
+    count = min(len(new_artists), budget // max(1, len(old_folders)))
+    score_pairs(old_folders, new_artists[:count], exhaustive=True)
+    verified_artists.update(new_artists[:count])
+    if score_pairs(old_folders, new_artists[count:], exhaustive=False):
+        verified_artists.update(new_artists[count:])
+
+    pair_scores.update(((folder, artist), similarity) for folder, artist, similarity in fresh)
+    cache.update(
+        verified_folders,
+        verified_artists,
+        [
+            (folder, artist, similarity)
+            for folder, artist, similarity in fresh
+            if folder in verified_folders and artist in verified_artists
+        ],
+    )
+
+    rows: Dict[str, List[int]] = {}
+    for row, name in enumerate(queries):
+        rows.setdefault(name, []).append(row)
+    columns: Dict[str, List[int]] = {}
+    for column, name in enumerate(choices):
+        columns.setdefault(name, []).append(column)
+
+    return sorted(
+        (row, column, score)
+        for (folder, artist), score in pair_scores.items()
+        for row in rows[folder]
+        for column in columns[artist]
+    )
+
+
+def score_folders(
     sorted_folders_list: List[Tuple[Tuple[str, str], str]],
     folders_dict: Dict[str, List[Tuple[str, str]]],
-    whitelist: List[Tuple[str, str]],
-    blacklist: List[Tuple[str, str]],
-) -> Generator[Tuple[str, str, int, Tuple[str, str]], bool, List[Match]]:
+    decisions: DecisionStore,
+    score_cache: Optional[PairScoreCache] = None,
+) -> Tuple[List[Match], List[Candidate]]:
+    """
+    Сравнивает существующие папки с артистами из новых папок без участия пользователя.
+    Возвращает совпадения, которые не требуют решения (whitelist и 100%), и пограничные пары,
+    сгруппированные по паре имён без учёта порядка.
+
+    Имена нормализуются один раз, оценки для всех пар считаются одной матрицей
+    или, для больших списков, по общим блокам (similar_pairs); с score_cache пересчитываются
+    только пары новых имён (cached_similar_pairs),
+    а дальше обходятся только пары выше SIMILARITY_THRESHOLD и пары из whitelist
+    в том же порядке, что и раньше: папки по порядку, внутри - артисты в порядке folders_dict.
+    """
     def add_to_matches(match: Match) -> None:
         if match not in matches:
             matches.append(match)
 
     
     matches: List[Match] = []
+    candidates: Dict[Tuple[str, str], Candidate] = {}
+
+    cleaned_folders: List[str] = [cleaned_folder for (_, cleaned_folder), _ in sorted_folders_list]
+    artist_names: List[str] = list(folders_dict)
+    cleaned_artist_names: List[str] = [remove_artist_keyword(artist_name) for artist_name in artist_names]
+
+    normalized_folders: List[str] = [normalize_name(cleaned_folder) for cleaned_folder in cleaned_folders]
+    normalized_artist_names: List[str] = [normalize_name(cleaned_artist_name) for cleaned_artist_name in cleaned_artist_names]
 
-    for (original_folder, cleaned_folder), _ in sorted_folders_list:
-        for artist_name, folder_list in folders_dict.items():
-            cleaned_artist_name: str = remove_artist_keyword(artist_name)
-            similarity: int = fuzz.token_set_ratio(cleaned_folder, cleaned_artist_name)
-
-            for folder_name, _ in folder_list:
-                match: Match = Match(original_folder, cleaned_artist_name, folder_name, similarity)
-                pair: Tuple[str, str] = (cleaned_folder, cleaned_artist_name)
-                reverse_pair: Tuple[str, str] = (cleaned_artist_name, cleaned_folder)
-
-                if pair in whitelist or reverse_pair in whitelist:
-                    add_to_matches(match)
-                elif pair in blacklist or reverse_pair in blacklist:
-                    continue
-                elif SIMILARITY_THRESHOLD <= similarity < 100:
-                    res: bool = yield original_folder, artist_name, similarity, pair
-                    if res:
-                        add_to_matches(match)
-                elif similarity == 100:
-                    add_to_matches(match)
+    if score_cache is not None:
+        scored = cached_similar_pairs(normalized_folders, normalized_artist_names, score_cache)
+    else:
+        scored = similar_pairs(normalized_folders, normalized_artist_names)
+    cells: Dict[Tuple[int, int], int] = {(row, column): similarity for row, column, similarity in scored}
+
+    folder_rows: Dict[str, List[int]] = {}
+    for row, cleaned_folder in enumerate(cleaned_folders):
+        folder_rows.setdefault(cleaned_folder, []).append(row)
+    artist_columns: Dict[str, List[int]] = {}
+    for column, cleaned_artist_name in enumerate(cleaned_artist_names):
+        artist_columns.setdefault(cleaned_artist_name, []).append(column)
+
+    for left, right in decisions.whitelist():
+        for first, second in ((left, right), (right, left)):
+            for row in folder_rows.get(first, ()):
+                for column in artist_columns.get(second, ()):
+                    if (row, column) not in cells:
+                        cells[(row, column)] = int(round(fuzz.token_set_ratio(
+                            normalized_folders[row], normalized_artist_names[column]
+                        )))
+
+    for row, column in sorted(cells):
+        similarity: int = cells[(row, column)]
+        (original_folder, cleaned_folder), _ = sorted_folders_list[row]
+        artist_name: str = artist_names[column]
+        cleaned_artist_name: str = cleaned_artist_names[column]
+
+        for folder_name, _ in folders_dict[artist_name]:
+            match: Match = Match(original_folder, cleaned_artist_name, folder_name, similarity)
+            pair: Tuple[str, str] = (cleaned_folder, cleaned_artist_name)
+            decision: Optional[bool] = decisions.get(*pair)
+
+            if decision:
+                add_to_matches(match)
+            elif decision is False:
+                continue
+            elif SIMILARITY_THRESHOLD <= similarity < 100:
+                candidate = candidates.setdefault(
+                    pair_key(*pair), Candidate(original_folder, artist_name, similarity, pair, [])
+                )
+                if match not in candidate.matches:
+                    candidate.matches.append(match)
+            elif similarity == 100:
+                add_to_matches(match)
       
-    return matches
+    return matches, list(candidates.values())
+
+
+def collect_folders() -> Tuple[List[Tuple[Tuple[str, str], str]], Dict[str, List[Tuple[str, str]]]]:
+    """Существующие папки (отсортированные, с очищенными именами) и словарь артистов из новых папок по всем PATHS."""
+    folders_list: List[Tuple[str, str]] = []
+    new_folders_list: List[Tuple[str, str]] = []
+    for path in PATHS:
+        folders_list.extend(get_folders_list(path))
+        new_folders_list.extend(get_new_folders_list(path))
+
+    sorted_folders_list = sorted((clean_folders_list(folder), _path) for folder, _path in folders_list)
+    return sorted_folders_list, create_folders_dict(new_folders_list)
 
 
 def move_matched_folders(matches: List[Match], fake_move: bool = False) -> List[str]:
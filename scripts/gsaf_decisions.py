@@ -0,0 +1,124 @@
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+WHITELIST: str = "whitelist"
+BLACKLIST: str = "blacklist"
+COMPACT_MIN_RECORDS: int = 100
+COMPACT_RATIO: float = 2.0
+
+
+def pair_key(first: str, second: str) -> Tuple[str, str]:
+    """Ключ пары без учёта порядка."""
+    return (first, second) if first <= second else (second, first)
+
+
+class DecisionStore:
+    """
+    Решения по парам GSAF (whitelist - одно и то же имя, blacklist - разные) с поиском за O(1).
+
+    Формат файла прежний: секции "## blacklist" / "## whitelist" со строками "папка,артист".
+    Новое решение дописывается в конец (с заголовком секции, если последняя секция другая),
+    при чтении более позднее решение по паре заменяет прежнее. Когда записей в файле становится
+    в COMPACT_RATIO раз больше, чем живых решений, файл переписывается целиком.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.decisions: Dict[Tuple[str, str], bool] = {}
+        self.pairs: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self.records: int = 0
+        self.last_section: Optional[str] = None
+        self.ends_with_newline: bool = True
+        self._lock: threading.Lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        self.decisions.clear()
+        self.pairs.clear()
+        self.records = 0
+        self.last_section = None
+        self.ends_with_newline = True
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            text = f.read()
+        self.ends_with_newline = not text or text.endswith("\n")
+        for line in text.splitlines():
+            line = line.strip()
+            if line.startswith("##"):
+                if BLACKLIST in line:
+                    self.last_section = BLACKLIST
+                elif WHITELIST in line:
+                    self.last_section = WHITELIST
+            elif line and self.last_section is not None:
+                item = tuple(line.split(","))
+                if len(item) == 2:
+                    self._set(item, self.last_section == WHITELIST)
+                    self.records += 1
+
+    def _set(self, pair: Tuple[str, str], is_whitelist: bool) -> None:
+        key = pair_key(*pair)
+        self.decisions[key] = is_whitelist
+        self.pairs[key] = pair
+
+    def get(self, first: str, second: str) -> Optional[bool]:
+        """True - whitelist, False - blacklist, None - решения нет."""
+        return self.decisions.get(pair_key(first, second))
+
+    def whitelist(self) -> List[Tuple[str, str]]:
+        return [self.pairs[key] for key, is_whitelist in self.decisions.items() if is_whitelist]
+
+    def blacklist(self) -> List[Tuple[str, str]]:
+        return [self.pairs[key] for key, is_whitelist in self.decisions.items() if not is_whitelist]
+
+    def add(self, folder: str, key: str, is_whitelist: bool) -> None:
+        self.add_many([(folder, key, is_whitelist)])
+
+    def add_many(self, decisions: Iterable[Tuple[str, str, bool]]) -> int:
+        """Дописывает решения одной записью в файл. Возвращает число изменившихся решений."""
+        with self._lock:
+            lines: List[str] = []
+            section = self.last_section
+            for folder, key, is_whitelist in decisions:
+                if self.get(folder, key) == is_whitelist:
+                    continue
+
+                self._set((folder, key), is_whitelist)
+                wanted = WHITELIST if is_whitelist else BLACKLIST
+                if section != wanted:
+                    lines.append(f"\n## {wanted}\n" if section is not None else f"## {wanted}\n")
+                    section = wanted
+                lines.append(f"{folder},{key}\n")
+
+            changed = sum(not line.startswith(("\n", "##")) for line in lines)
+            if lines:
+                if not self.ends_with_newline:
+                    lines.insert(0, "\n")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+                self.ends_with_newline = True
+                self.records += changed
+                self.last_section = section
+
+            if self.records >= COMPACT_MIN_RECORDS and self.records > len(self.decisions) * COMPACT_RATIO:
+                self._compact()
+            return changed
+
+    def compact(self) -> None:
+        with self._lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(f"## {BLACKLIST}\n")
+            for folder, key in self.blacklist():
+                f.write(f"{folder},{key}\n")
+            f.write(f"\n## {WHITELIST}\n")
+            for folder, key in self.whitelist():
+                f.write(f"{folder},{key}\n")
+        os.replace(tmp_path, self.path)
+        self.records = len(self.decisions)
+        self.last_section = WHITELIST
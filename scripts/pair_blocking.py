@@ -0,0 +1,61 @@
+from typing import Dict, Iterable, List, Set
+
+BLOCK_NGRAM_SIZE: int = 3
+BLOCK_AFFIX_SIZE: int = 2
+MAX_NGRAM_BLOCK: int = 2000
+
+
+def block_keys(name: str, ngram_size: int = BLOCK_NGRAM_SIZE, affix_size: int = BLOCK_AFFIX_SIZE) -> Set[str]:
+    """
+    Ключи блоков для уже нормализованного имени: целые слова ("t:"), их начала и концы ("p:", "s:")
+    и n-граммы символов имени без пробелов ("g:"). Имя короче n-граммы само становится n-граммой.
+    Начала и концы слов ловят короткие имена со вставкой в середине ("mimi" - "mikumi"),
+    у которых может не быть общих n-грамм.
+    """
+    keys: Set[str] = set()
+    for token in name.split():
+        keys.add(f"t:{token}")
+        keys.add(f"p:{token[:affix_size]}")
+        keys.add(f"s:{token[-affix_size:]}")
+
+    compact = name.replace(" ", "")
+    if len(compact) < ngram_size:
+        if compact:
+            keys.add(f"g:{compact}")
+    else:
+        keys.update(f"g:{compact[i:i + ngram_size]}" for i in range(len(compact) - ngram_size + 1))
+    return keys
+
+
+class BlockingIndex:
+    """
+    Индекс блоков по списку имён: для запроса отдаёт только те имена, с которыми у него
+    есть общее слово, начало или конец слова или n-грамма.
+
+    Пара с высоким token_set_ratio почти всегда делит хотя бы одну n-грамму, а пара, где слова одного
+    имени входят в другое (оценка 100), - целое слово. Блоки n-грамм больше MAX_NGRAM_BLOCK имён
+    (частые сочетания букв) пропускаются, как стоп-слова; блоки слов, начал и концов используются всегда.
+    Насколько это теряет пары, показывает blocking_recall; get_same_artists_folders.choose_blocking
+    проверяет её на выборке и при нехватке пропускает меньше блоков.
+    """
+
+    def __init__(self, names: Iterable[str], max_ngram_block: int = MAX_NGRAM_BLOCK) -> None:
+        self.names: List[str] = list(names)
+        self.max_ngram_block: int = max_ngram_block
+        self.blocks: Dict[str, List[int]] = {}
+        for position, name in enumerate(self.names):
+            for key in block_keys(name):
+                self.blocks.setdefault(key, []).append(position)
+
+    def candidates(self, name: str) -> Set[int]:
+        result: Set[int] = set()
+        for key in block_keys(name):
+            block = self.blocks.get(key)
+            if block is None or (key.startswith("g:") and len(block) > self.max_ngram_block):
+                continue
+            result.update(block)
+        return result
+
+    def pair_count(self, queries: Iterable[str]) -> int:
+        """Сколько пар придётся оценить для queries."""
+        return sum(len(self.candidates(query)) for query in queries)
@@ -0,0 +1,95 @@
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+
+PAIR_SCORE_CACHE_FILE: str = "gsaf_pair_scores.sqlite"
+FOLDER: int = 0
+ARTIST: int = 1
+
+
+class PairScoreCache:
+    """
+    Оценки пар (очищенная папка, очищенный артист) между запусками, в SQLite.
+
+    Хранятся только пары не ниже порога и все имена, для которых пары уже посчитаны полностью:
+    пара двух известных имён без записи значит "ниже порога". Если порог или версия оценки
+    изменились, кэш очищается. Остальные имена (нет в текущем запуске или пары посчитаны
+    не полностью) удаляются вместе с их парами.
+    """
+
+    def __init__(self, score_cutoff: float, scorer_version: str, path: str = PAIR_SCORE_CACHE_FILE) -> None:
+        self.path: str = path
+        self._lock: threading.Lock = threading.Lock()
+        self.connection: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS names (
+                    side INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    last_seen REAL NOT NULL,
+                    PRIMARY KEY (side, name)
+                );
+                CREATE TABLE IF NOT EXISTS scores (
+                    folder TEXT NOT NULL,
+                    artist TEXT NOT NULL,
+                    score INTEGER NOT NULL,
+                    PRIMARY KEY (folder, artist)
+                );
+                CREATE INDEX IF NOT EXISTS scores_artist ON scores (artist);
+            """)
+        self.check_meta({"score_cutoff": str(score_cutoff), "scorer_version": scorer_version})
+
+    def check_meta(self, meta: Dict[str, str]) -> None:
+        stored = dict(self.connection.execute("SELECT key, value FROM meta"))
+        if stored == meta:
+            return
+
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM scores")
+            self.connection.execute("DELETE FROM names")
+            self.connection.execute("DELETE FROM meta")
+            self.connection.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", meta.items())
+
+    def known(self, side: int) -> Set[str]:
+        with self._lock:
+            return {name for (name,) in self.connection.execute("SELECT name FROM names WHERE side = ?", (side,))}
+
+    def scores(self) -> List[Tuple[str, str, int]]:
+        with self._lock:
+            return list(self.connection.execute("SELECT folder, artist, score FROM scores"))
+
+    def update(
+        self,
+        folders: Iterable[str],
+        artists: Iterable[str],
+        scores: Iterable[Tuple[str, str, int]],
+    ) -> None:
+        """
+        Записывает новые оценки и делает известными ровно folders и artists:
+        остальные имена и их пары удаляются.
+        """
+        now = time.time()
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO scores (folder, artist, score) VALUES (?, ?, ?)", scores
+            )
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS current (side INTEGER, name TEXT, PRIMARY KEY (side, name))")
+            self.connection.execute("DELETE FROM current")
+            self.connection.executemany("INSERT OR IGNORE INTO current VALUES (?, ?)", ((FOLDER, name) for name in folders))
+            self.connection.executemany("INSERT OR IGNORE INTO current VALUES (?, ?)", ((ARTIST, name) for name in artists))
+
+            self.connection.execute(f"""
+                DELETE FROM scores
+                WHERE folder NOT IN (SELECT name FROM current WHERE side = {FOLDER})
+                   OR artist NOT IN (SELECT name FROM current WHERE side = {ARTIST})
+            """)
+            self.connection.execute("DELETE FROM names WHERE (side, name) NOT IN (SELECT side, name FROM current)")
+            self.connection.execute(
+                "INSERT OR REPLACE INTO names (side, name, last_seen) SELECT side, name, ? FROM current", (now,)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.close()
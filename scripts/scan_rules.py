@@ -0,0 +1,137 @@
+import fnmatch
+import os
+import re
+from typing import Dict, Generator, Iterable, List, Optional, Tuple
+
+EXCLUDE: int = 1
+INCLUDE: int = 2
+
+
+class PathTrie:
+    """
+    Префиксное дерево путей по частям пути: самый глубокий префикс с пометкой решает,
+    исключено поддерево или явно разрешено.
+    """
+
+    def __init__(self) -> None:
+        self.root: Dict = {}
+
+    @staticmethod
+    def split(path: str) -> List[str]:
+        return [part for part in os.path.normcase(os.path.normpath(path)).split(os.sep) if part]
+
+    def add(self, path: str, mark: int) -> None:
+        node = self.root
+        for part in self.split(path):
+            node = node.setdefault(part, {})
+        node[None] = mark
+
+    def lookup(self, path: str) -> Optional[int]:
+        mark: Optional[int] = None
+        node = self.root
+        for part in self.split(path):
+            node = node.get(part)
+            if node is None:
+                break
+            mark = node.get(None, mark)
+        return mark
+
+
+class ScanRules:
+    """
+    Единые правила обхода папок, которые применяются до спуска в папку.
+
+    exclude_names - точные имена папок, exclude_globs - шаблоны fnmatch по имени,
+    exclude_paths - поддеревья по пути, include_paths - поддеревья, которые обходятся всегда,
+    даже если имя или шаблон их исключает. Пути хранятся в PathTrie, шаблоны собраны в одно регулярное выражение.
+    """
+
+    def __init__(
+        self,
+        exclude_names: Iterable[str] = (),
+        exclude_globs: Iterable[str] = (),
+        exclude_paths: Iterable[str] = (),
+        include_paths: Iterable[str] = (),
+    ) -> None:
+        self.exclude_names: frozenset = frozenset(exclude_names)
+        globs: List[str] = list(exclude_globs)
+        self.exclude_glob: Optional[re.Pattern] = (
+            re.compile("|".join(fnmatch.translate(glob) for glob in globs)) if globs else None
+        )
+        self.paths: PathTrie = PathTrie()
+        for path in exclude_paths:
+            self.paths.add(path, EXCLUDE)
+        for path in include_paths:
+            self.paths.add(path, INCLUDE)
+
+    def prune(self, path: str, name: Optional[str] = None) -> bool:
+        """Нужно ли пропустить папку path вместе со всем, что в ней лежит."""
+        mark = self.paths.lookup(path)
+        if mark is not None:
+            return mark == EXCLUDE
+
+        name = os.path.basename(path) if name is None else name
+        if name in self.exclude_names:
+            return True
+        return self.exclude_glob is not None and self.exclude_glob.match(name) is not None
+
+    def is_excluded(self, path: str) -> bool:
+        """Исключена ли папка сама или через кого-то из предков."""
+        path = os.path.normpath(path)
+        while True:
+            if self.prune(path):
+                return True
+            parent = os.path.dirname(path)
+            if parent == path:
+                return False
+            path = parent
+
+    def list_dirs(self, path: str) -> List[str]:
+        """Имена подпапок path, которые не отсекаются правилами."""
+        try:
+            with os.scandir(path) as entries:
+                return [
+                    entry.name
+                    for entry in entries
+                    if entry.is_dir() and not self.prune(entry.path, entry.name)
+                ]
+        except OSError:
+            return []
+
+    def walk(self, top: str, topdown: bool = True) -> Generator[Tuple[str, List[str], List[str]], None, None]:
+        """
+        Как os.walk, но исключённые папки убираются из списка подпапок до спуска и не читаются вовсе.
+        При topdown=True список подпапок, как и в os.walk, можно сократить на месте.
+        """
+        if self.is_excluded(top):
+            return
+        yield from self._walk(top, topdown)
+
+    def _walk(self, top: str, topdown: bool) -> Generator[Tuple[str, List[str], List[str]], None, None]:
+        folders: List[str] = []
+        files: List[str] = []
+        links: set = set()
+        try:
+            with os.scandir(top) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+
+                    if not is_dir:
+                        files.append(entry.name)
+                    elif not self.prune(entry.path, entry.name):
+                        folders.append(entry.name)
+                        if entry.is_symlink():
+                            links.add(entry.name)
+        except OSError:
+            return
+
+        if topdown:
+            yield top, folders, files
+        for folder in folders:
+            if folder not in links:
+                yield from self._walk(os.path.join(top, folder), topdown)
+        if not topdown:
+            yield top, folders, files
@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+SEARCH_CACHE_FILE: str = "search_cache.json"
+MAX_CACHE_ENTRIES: int = 50
+MAX_CACHED_RESULTS: int = 5000
+
+
+def query_parts(query: str) -> List[str]:
+    """
+    Части запроса через "+" без пробелов по краям, в нижнем регистре, без повторов и пустых частей.
+    По ним и ищется, и строится ключ кэша, так что запросы с одним ключом дают один результат.
+    """
+    return sorted({part.strip().lower() for part in os.path.basename(query).split("+")} - {""})
+
+
+def normalize_query(query: str) -> str:
+    return "+".join(query_parts(query))
+
+
+class SearchCache:
+    """
+    Кэш результатов поиска по нормализованному запросу.
+
+    Каждая запись помечена поколением дерева папок; при несовпадении поколения
+    запись считается устаревшей и удаляется. Хранит последние MAX_CACHE_ENTRIES запросов.
+    Сохраняется в отдельный файл, чтобы не раздувать data.json, который читается очень часто.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Dict]] = None, max_entries: int = MAX_CACHE_ENTRIES) -> None:
+        self.entries: Dict[str, Dict] = dict(entries or {})
+        self.max_entries: int = max_entries
+        self.dirty: bool = False
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self, query: str, generation: str) -> Optional[List[str]]:
+        key = normalize_query(query)
+        with self._lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+            if entry["generation"] != generation:
+                self.dirty = True
+                return None
+
+            self.entries[key] = entry
+            return list(entry["folders"])
+
+    def put(self, query: str, generation: str, folders: List[str]) -> None:
+        key = normalize_query(query)
+        if not key or len(folders) > MAX_CACHED_RESULTS:
+            return
+
+        with self._lock:
+            self.entries.pop(key, None)
+            self.entries[key] = {"generation": generation, "folders": list(folders)}
+            while len(self.entries) > self.max_entries:
+                del self.entries[next(iter(self.entries))]
+            self.dirty = True
+
+    def to_dict(self) -> Dict[str, Dict]:
+        with self._lock:
+            self.dirty = False
+            return dict(self.entries)
+
+    def save(self, path: str = SEARCH_CACHE_FILE) -> None:
+        entries = self.to_dict()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = SEARCH_CACHE_FILE) -> "SearchCache":
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(json.load(f))
+        except (IOError, json.JSONDecodeError):
+            return cls()
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+TRASH_SIGNATURES_FILE: str = "trash_signatures.json"
+PREFIX_SIZE: int = 4096
+READ_CHUNK_SIZE: int = 1024 * 1024
+
+
+def prefix_digest(prefix: bytes) -> str:
+    return hashlib.blake2b(prefix, digest_size=8).hexdigest()
+
+
+class TrashSignatureStore:
+    """
+    Сигнатуры известных мусорных файлов: точный размер, хэш первых PREFIX_SIZE байт и полный md5.
+
+    Файл читается только если его размер совпал с одной из сигнатур, и дочитывается до конца
+    только если совпал ещё и префикс. Старые md5 без размера (legacy_md5) проверяются
+    полным хэшем файлов меньше legacy_max_size; найденный файл превращается в обычную сигнатуру.
+    """
+
+    def __init__(self, legacy_md5: Iterable[str] = (), legacy_max_size: int = 0) -> None:
+        self.signatures: Dict[int, Dict[str, Set[str]]] = {}
+        self.legacy_md5: Set[str] = set(legacy_md5)
+        self.legacy_max_size: int = legacy_max_size
+        self.dirty: bool = False
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(md5s) for prefixes in self.signatures.values() for md5s in prefixes.values())
+
+    def known_md5(self) -> Set[str]:
+        return {md5 for prefixes in self.signatures.values() for md5s in prefixes.values() for md5 in md5s}
+
+    def add(self, size: int, prefix: str, md5: str) -> bool:
+        with self._lock:
+            md5s = self.signatures.setdefault(size, {}).setdefault(prefix, set())
+            if md5 in md5s:
+                return False
+            md5s.add(md5)
+            self.legacy_md5.discard(md5)
+            self.dirty = True
+            return True
+
+    def might_match(self, size: int) -> bool:
+        """Стоит ли вообще открывать файл такого размера."""
+        return size in self.signatures or (bool(self.legacy_md5) and size < self.legacy_max_size)
+
+    def match(self, path: str, size: Optional[int] = None) -> bool:
+        """Является ли файл известным мусором. Читает файл только когда без этого не решить."""
+        try:
+            if size is None:
+                size = os.path.getsize(path)
+            if not self.might_match(size):
+                return False
+
+            with open(path, "rb") as f:
+                prefix = f.read(PREFIX_SIZE)
+                candidates = self.signatures.get(size, {}).get(prefix_digest(prefix))
+                check_legacy = bool(self.legacy_md5) and size < self.legacy_max_size
+                if not candidates and not check_legacy:
+                    return False
+
+                md5 = hashlib.md5(prefix)
+                while chunk := f.read(READ_CHUNK_SIZE):
+                    md5.update(chunk)
+        except OSError:
+            return False
+
+        digest = md5.hexdigest()
+        if candidates and digest in candidates:
+            return True
+        if check_legacy and digest in self.legacy_md5:
+            self.add(size, prefix_digest(prefix), digest)
+            return True
+        return False
+
+    def add_file(self, path: str) -> bool:
+        """Запоминает файл как мусорный. Возвращает False, если такая сигнатура уже есть."""
+        size, prefix, md5 = file_signature(path)
+        return self.add(size, prefix, md5)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            self.dirty = False
+            return {
+                "signatures": [
+                    {"size": size, "prefix": prefix, "md5": md5}
+                    for size, prefixes in sorted(self.signatures.items())
+                    for prefix, md5s in sorted(prefixes.items())
+                    for md5 in sorted(md5s)
+                ],
+                "legacy_md5": sorted(self.legacy_md5),
+            }
+
+    def save(self, path: str = TRASH_SIGNATURES_FILE) -> None:
+        data = self.to_dict()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(
+        cls,
+        path: str = TRASH_SIGNATURES_FILE,
+        legacy_md5: Iterable[str] = (),
+        legacy_max_size: int = 0,
+    ) -> "TrashSignatureStore":
+        """
+        Загружает сигнатуры из файла. md5 из legacy_md5, для которых ещё нет сигнатуры,
+        добавляются в список для доучивания.
+        """
+        store = cls(legacy_max_size=legacy_max_size)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (IOError, json.JSONDecodeError):
+            data = {}
+
+        for signature in data.get("signatures", []):
+            store.add(signature["size"], signature["prefix"], signature["md5"])
+        store.legacy_md5 = (set(data.get("legacy_md5", [])) | set(legacy_md5)) - store.known_md5()
+        store.dirty = False
+        return store
+
+
+def file_signature(path: str) -> Tuple[int, str, str]:
+    """(размер, хэш префикса, md5) файла."""
+    with open(path, "rb") as f:
+        prefix = f.read(PREFIX_SIZE)
+        md5 = hashlib.md5(prefix)
+        while chunk := f.read(READ_CHUNK_SIZE):
+            md5.update(chunk)
+    return os.path.getsize(path), prefix_digest(prefix), md5.hexdigest()
+
@@ -1,14 +1,15 @@
 from typing import Callable, Dict, List, Optional
 from functools import partial
 
-from PyQt5.QtWidgets import QVBoxLayout, QHBoxLayout, QLabel, QWidget, QBoxLayout
+from PyQt5.QtWidgets import QVBoxLayout, QHBoxLayout, QLabel, QListView, QAbstractItemView, QShortcut
 from PyQt5.QtCore import Qt, QPoint, QMargins
+from PyQt5.QtGui import QKeySequence
 
+from classes.filter_list_model import FilterListModel
 from main_window import MainWindow
-from scripts.deleter_empty_folder_and_more import get_bl_artist
 from styles.popups.base_popup import BasePopup, Position
 from styles.popups.input_popup import InputPopup
-from styles.material import MaterialColor, MaterialIconPushButton, MaterialScrollArea
+from styles.material import MaterialColor, MaterialIconPushButton, MaterialLineEdit
 import utils as U
 
 
@@ -19,6 +20,7 @@ class ListPopup(BasePopup):
             title: str, 
             list_data: List[str] | Dict[str, List[str]],
             remove_callback: Callable[[str, str, bool | None], List[str] | Dict[str, List[str]]],
+            add_callback: Optional[Callable[[str, str, bool], Optional[str]]] = None,
             no_overlay: bool = False,
             block_overlay: bool = False,
             position: Optional[QPoint | Position] = Position.CENTER,
@@ -29,6 +31,7 @@ class ListPopup(BasePopup):
 
         self.list_data = list_data
         self.remove_callback = remove_callback
+        self.add_callback = add_callback
 
         self.content_layout = QVBoxLayout()
         self.content_layout.setContentsMargins(10, 10, 10, 10)
@@ -48,6 +51,7 @@ class ListPopup(BasePopup):
         self.add_button.setFixedHeight(30)
         self.add_button.clicked.connect(self.add_item)
         self.vbox_pre_choise_layout.addWidget(self.add_button)
+        self.add_button.setVisible(add_callback is not None)
 
         self.hbox_choise_layout = QHBoxLayout()
         self.vbox_pre_choise_layout.addLayout(self.hbox_choise_layout)
@@ -62,59 +66,84 @@ class ListPopup(BasePopup):
                 choise_button.clicked.connect(partial(self.choise_button_clicked, category))
                 self.hbox_choise_layout.addWidget(choise_button)
 
-        self.scroll_area = MaterialScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.content_layout.addWidget(self.scroll_area)
-
-        self.scroll_widget = QWidget()
-        self.scroll_widget.setObjectName("LP_BG_Widget")
-        self.scroll_widget.setStyleSheet(f"""
-            #LP_BG_Widget {{
+        self.filter_field = MaterialLineEdit()
+        self.filter_field.setPlaceholderText("Filter")
+        self.filter_field.setFixedHeight(35)
+        self.filter_field.textChanged.connect(self.filter_changed)
+        self.content_layout.addWidget(self.filter_field)
+
+        self.models: Dict[str | None, FilterListModel] = {
+            category: FilterListModel(items, self)
+            for category, items in (self.list_data.items() if isinstance(self.list_data, dict) else [(None, self.list_data)])
+        }
+
+        self.list_view = QListView()
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.list_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.list_view.setStyleSheet(f"""
+            QListView {{
                 background-color: {MaterialColor.dark_primary_color};
+                color: {MaterialColor.text_color};
+                font-size: 14px;
+                border: none;
+            }}
+            QListView::item {{
+                padding: 4px;
+            }}
+            QListView::item:selected {{
+                background-color: {MaterialColor.accent_color};
+            }}
+            QScrollBar:vertical {{
+                background-color: {MaterialColor.transparent_color};
+                width: 10px;
+            }}
+            QScrollBar::handle:vertical {{
+                background-color: {MaterialColor.primary_color};
+                border-radius: 5px;
+                min-height: 40px;
+            }}
+            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {{
+                border: none;
+                background: none;
             }}
         """)
-        self.scroll_area.setWidget(self.scroll_widget)
+        self.content_layout.addWidget(self.list_view)
 
-        self.scroll_layout: QVBoxLayout = QVBoxLayout()
-        self.scroll_layout.setContentsMargins(0, 0, 0, 0)
-        self.scroll_layout.setSpacing(5)
-        self.scroll_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.scroll_widget.setLayout(self.scroll_layout)
+        self.actions_layout = QHBoxLayout()
+        self.content_layout.addLayout(self.actions_layout)
+
+        self.delete_button = MaterialIconPushButton(text="Delete")
+        self.delete_button.setFixedHeight(30)
+        self.delete_button.clicked.connect(self.delete_selected)
+        self.actions_layout.addWidget(self.delete_button)
+
+        self.move_button = MaterialIconPushButton(text="Move")
+        self.move_button.setFixedHeight(30)
+        self.move_button.clicked.connect(self.move_selected)
+        self.actions_layout.addWidget(self.move_button)
+
+        self.delete_shortcut = QShortcut(QKeySequence(QKeySequence.StandardKey.Delete), self.list_view)
+        self.delete_shortcut.activated.connect(self.delete_selected)
+
+        self.list_view.setModel(self.models[next(iter(self.models))])
+
+    @property
+    def model(self) -> FilterListModel:
+        return self.list_view.model()
+
+    def filter_changed(self, text: str) -> None:
+        self.model.set_filter(text)
+
+    def selected_items(self) -> List[str]:
+        return [self.model.item(index.row()) for index in self.list_view.selectionModel().selectedRows()]
 
-        self.update_layout(self.list_data if isinstance(self.list_data, list) else self.list_data[list(self.list_data.keys())[0]])
-    
-    def clear_layout(self) -> None:
-        childs: List[QBoxLayout] = self.scroll_layout.children()
-        for i in childs:
-            sub_childs = U.get_hidden_children(i)
-            for j in sub_childs:
-                j.deleteLater()
-                j.hide()
-            i.deleteLater
-
-    def update_layout(self, list_data: List[str]) -> None:
-        self.clear_layout()
-        for item in list_data:
-            hbox = QHBoxLayout()
-            self.scroll_layout.addLayout(hbox)
-            choise_button = MaterialIconPushButton(text=item)
-            choise_button.setFixedHeight(25)
-            
-            hbox.addWidget(choise_button, stretch=99)
-            delete_button = MaterialIconPushButton(text="  D  ")
-            delete_button.setFixedHeight(25)
-            delete_button.clicked.connect(partial(self.delete_item, item, MainWindow.get_main_window(self).fake_delete))
-            
-            hbox.addWidget(delete_button)
-            move_button = MaterialIconPushButton(text="  M  ")
-            move_button.setFixedHeight(25)
-            move_button.clicked.connect(partial(self.move_to_another_category, item))
-            hbox.addWidget(move_button)
-    
     def add_item(self) -> None:
         def add_item_callback(item: str) -> None:
-            current_category = self.get_current_category()
-            get_bl_artist(item, current_category, fake_delete=MainWindow.get_main_window(self).fake_delete)
+            category = self.get_current_category()
+            added = self.add_callback(category, item, MainWindow.get_main_window(self).fake_delete)
+            if added:
+                self.models[category].add_item(added)
 
         input_popup = InputPopup(
             MainWindow.get_main_window(self), 
@@ -124,20 +153,19 @@ class ListPopup(BasePopup):
         )
         input_popup.show()
 
-    
+    def delete_selected(self) -> None:
+        fake_delete = MainWindow.get_main_window(self).fake_delete
+        for item in self.selected_items():
+            self.delete_item(item, fake_delete)
+
     def delete_item(self, item: str, fake_delete: bool = True) -> None:
-        def del_help(_item: str) -> bool:
-            hboxes = self.scroll_layout.children()
-            for hbox in hboxes:
-                childs = U.get_hidden_children(hbox)
-                for child in childs:
-                    if child.text() == _item:
-                        hbox.deleteLater()                        
-                        return True
-
-        if del_help(item):
-            category = self.get_current_category()
-            self.list_data = self.remove_callback(category, item, fake_delete)
+        category = self.get_current_category()
+        self.remove_callback(category, item, fake_delete)
+        self.models[category].remove_item(item)
+
+    def move_selected(self) -> None:
+        for item in self.selected_items():
+            self.move_to_another_category(item)
                 
     def move_to_another_category(self, item: str) -> None:
         # TODO: создать окно для выбора категории
@@ -153,9 +181,8 @@ class ListPopup(BasePopup):
     def choise_button_clicked(self, choise: str) -> None:
         childs = U.get_hidden_children(self.hbox_choise_layout)
         for child in childs:
-            if child.text() == choise:
-                child.setDisabled(True)
-            else:
-                child.setDisabled(False)
-                self.update_layout(self.list_data if isinstance(self.list_data, list) else self.list_data[choise])
+            child.setDisabled(child.text() == choise)
 
+        model = self.models[choise]
+        model.set_filter(self.filter_field.text())
+        self.list_view.setModel(model)
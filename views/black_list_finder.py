@@ -1,10 +1,12 @@
 import os
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QFileDialog, QLabel
 from PyQt5.QtCore import Qt
 
-from scripts.deleter_empty_folder_and_more import get_bl_artist, get_new_name_folder, rename_folder
+from scripts.blacklist_index import get_artist_index, store_artist_index
+from scripts.blacklist_store import BLACKLIST
+from scripts.deleter_empty_folder_and_more import fix_folder_name, get_bl_artist, get_new_name_folder, rename_folder
 from styles.header import HeaderButtons
 from styles.material import MaterialColor, MaterialIconPushButton, MaterialLineEdit, MaterialScrollArea
 from styles.popups import AcceptPopup, MoveLogPopup
@@ -21,6 +23,10 @@ class BlackListFinderView(BaseView):
 
         self.add_button(HeaderButtons.BACK)
         self.add_button(HeaderButtons.BL_MANAGER, postion_left=False)
+
+        self.renames: Dict[str, Tuple[str, str, str, str]] = {}
+        self.scanning: bool = False
+        BLACKLIST.subscribe(self.blacklist_changed)
         
         data = U.load_data()
         path = data.setdefault("BLF_last_path", "")
@@ -168,20 +174,50 @@ class BlackListFinderView(BaseView):
         if not os.path.exists(path):
             return
         
-        datas = []
-        for return_value in get_new_name_folder(path):
-            if isinstance(return_value, list):
-                popup_obj: AcceptPopup = self.main_window.show_accept_popup(
-                    f"Add {return_value[0]} to black_list?", 
-                    lambda: get_bl_artist(return_value[0])
-                )
-                popup_obj.exec_()
+        self.renames.clear()
+        folders_seen: List[str] = []
+        self.scanning = True
+        try:
+            for return_value in get_new_name_folder(path, folders_seen):
+                if isinstance(return_value, list):
+                    artist, blacklist_set = return_value
+                    popup_obj: AcceptPopup = self.main_window.show_accept_popup(
+                        f"Add {artist} to black_list?", 
+                        lambda: (get_bl_artist(artist), blacklist_set.add(fix_folder_name(artist)))
+                    )
+                    popup_obj.exec_()
+                else:
+                    self.renames[return_value[2]] = return_value
+        finally:
+            self.scanning = False
+
+        store_artist_index(path, folders_seen)
+        self.show_renames()
+
+    def show_renames(self) -> None:
+        if not self.renames:
+            self.clear_layout()
+            self.delete_button.setDisabled(True)
+            return
+
+        self.delete_button.setDisabled(False)
+        self.update_layout(sorted(self.renames.values(), key=lambda rename: -rename[2].count(os.sep)))
+
+    def blacklist_changed(self, category: str, name: str, added: bool) -> None:
+        """Пересчитывает переименования только для папок с name в имени, по индексу с последнего полного обхода."""
+        if self.scanning:
+            return
+
+        artist_index = get_artist_index(self.input_field.text())
+        if artist_index is None:
+            return
+
+        for folder, rename in artist_index.plan_renames([name], BLACKLIST.lookup_set()).items():
+            if rename is None:
+                self.renames.pop(folder, None)
             else:
-                datas.append(return_value)
-        
-        if datas:
-            self.delete_button.setDisabled(False)
-            self.update_layout(datas)
+                self.renames[folder] = rename
+        self.show_renames()
 
     def add_to_log(self, text: str) -> None:
         log = QLabel()
@@ -198,6 +234,7 @@ class BlackListFinderView(BaseView):
         self.log_popup.log_layout.addWidget(log)
 
     def delete_blacklisted(self) -> None:
+        artist_index = get_artist_index(self.input_field.text())
         widgets = U.get_hidden_children(self.scroll_layout)
         for widget in widgets:
             label = widget.findChild(QLabel, "CustomLabel")
@@ -213,6 +250,9 @@ class BlackListFinderView(BaseView):
                     if not result:
                         raise Exception(log)
                     
+                    self.renames.pop(original_full_path_folder, None)
+                    if artist_index is not None and not os.path.exists(original_full_path_folder):
+                        artist_index.move_tree(original_full_path_folder, fix_full_path)
                     self.add_to_log(log)
                     widget.findChild(QWidget, "BLF_Indicator").setStyleSheet("""    
                     #BLF_Indicator {
@@ -232,4 +272,6 @@ class BlackListFinderView(BaseView):
                 """)
                 print(f"{e=}`")
         
+        if artist_index is not None:
+            artist_index.save()
         self.delete_button.setDisabled(True)
@@ -1,10 +1,12 @@
 import os
-from typing import List, Optional, Tuple, Callable
+from typing import Dict, List, Optional, Set, Tuple, Callable
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QCheckBox, QLabel, QGraphicsDropShadowEffect, QFileDialog
-from PyQt5.QtCore import Qt, QSize, QEvent
+from PyQt5.QtCore import Qt, QSize, QEvent, QTimer
 from PyQt5.QtGui import QColor, QFont
 
-from scripts.deleter_empty_folder_and_more import del_from_path, find_empty_folders
+from classes.worker import GeneratorWorker
+from scripts.deleter_empty_folder_and_more import DeleteResult, ScanProgress, add_trash_signatures, del_from_paths, get_hash_workers, iter_empty_folders
+from scripts.scan_rules import ScanRules
 from styles.header import HeaderButtons
 from styles.material import MaterialColor, MaterialIconButton, MaterialIconPushButton, MaterialLineEdit, MaterialScrollArea, MaterialIconCheckbox
 from views import BaseView
@@ -16,6 +18,10 @@ class EmptyFoldersFinderView(BaseView):
 
     def __init__(self, parent) -> None:
         super().__init__("Empty Folders Finder", parent)
+        self.scan_worker: Optional[GeneratorWorker] = None
+        self.scan_progress: ScanProgress = ScanProgress()
+        self.whitelist: Set[str] = set()
+        self.scan_del_trash_files: bool = False
 
         self.add_button(HeaderButtons.BACK)
         
@@ -98,11 +104,30 @@ class EmptyFoldersFinderView(BaseView):
         self.start_scan_button.clicked.connect(self.start_scan)
         self.actions_layout.addWidget(self.start_scan_button)
 
+        self.stop_scan_button = MaterialIconPushButton(text="Stop", height=50)
+        self.stop_scan_button.clicked.connect(self.stop_scan)
+        self.stop_scan_button.hide()
+        self.actions_layout.addWidget(self.stop_scan_button)
+
+        self.progress_label: QLabel = QLabel()
+        self.progress_label.setWordWrap(True)
+        self.progress_label.hide()
+        self.actions_layout.addWidget(self.progress_label)
+
+        self.progress_timer: QTimer = QTimer(self)
+        self.progress_timer.setInterval(200)
+        self.progress_timer.timeout.connect(self.update_progress_label)
+
         self.checkbox_trash_turn: MaterialIconCheckbox = MaterialIconCheckbox()
         self.checkbox_trash_turn.setText("Scan Trash")
         self.checkbox_trash_turn.setChecked(Qt.CheckState.Checked)
         self.actions_layout.addWidget(self.checkbox_trash_turn)
 
+        self.add_trash_button: MaterialIconPushButton = MaterialIconPushButton(text="Add Trash Files")
+        self.add_trash_button.setToolTip("Remember chosen files as trash, so Scan Trash finds their copies")
+        self.add_trash_button.clicked.connect(self.add_trash_files)
+        self.actions_layout.addWidget(self.add_trash_button)
+
         self.checkbox_trashcan_turn: MaterialIconCheckbox = MaterialIconCheckbox()
         self.checkbox_trashcan_turn.setText("To Trashcan")
         self.checkbox_trashcan_turn.setChecked(Qt.CheckState.Checked)
@@ -130,6 +155,15 @@ class EmptyFoldersFinderView(BaseView):
         if folder:
             self.input_field.setText(folder)
 
+    def add_trash_files(self) -> None:
+        directory = self.input_field.text() if os.path.isdir(self.input_field.text()) else ""
+        files, _ = QFileDialog.getOpenFileNames(self, "Select Trash Files", directory=directory)
+        if not files:
+            return
+
+        added: int = add_trash_signatures(files)
+        self.main_window.show_toast(f"Added {added} trash signatures")
+
     def trashcan_changed(self, state: int):
         if state == Qt.CheckState.Checked:
             self.checkbox_trashcan_turn.setText("To trashcan")
@@ -147,6 +181,11 @@ class EmptyFoldersFinderView(BaseView):
 
     
     def update_folder_list(self, items: List[str | None]) -> None:
+        self.clear_layout()
+        self.whitelist = set(U.load_data().setdefault("EFF_whitelist", []))
+        self.append_folder_rows(items)
+
+    def append_folder_rows(self, items: List[str | None]) -> None:
         def create_button_fl(
                 original_icon_open_folder: str,
                 connect_func: Callable,
@@ -166,11 +205,8 @@ class EmptyFoldersFinderView(BaseView):
             
             return open_folder_button
 
-        self.clear_layout()
-        whitelist: List[Optional[str]] = U.load_data().setdefault("EFF_whitelist", [])
-
         for item in items:
-            if item in whitelist:
+            if item in self.whitelist:
                 continue
             background_hbox: QWidget = QWidget()
             self.folder_list.addWidget(background_hbox)
@@ -190,7 +226,7 @@ class EmptyFoldersFinderView(BaseView):
             background_hbox.setLayout(hb_layout)
 
             checkbox = MaterialIconCheckbox()
-            checkbox.stateChanged.connect(lambda: self.checkbox_changed(checkbox))
+            checkbox.stateChanged.connect(lambda _, c=checkbox: self.checkbox_changed(c))
             hb_layout.addWidget(checkbox, stretch=1)
             
             label_path: QLabel = QLabel()
@@ -200,7 +236,7 @@ class EmptyFoldersFinderView(BaseView):
 
             add_to_wl_button = create_button_fl(
                 "library_add_24dp_5F6368_FILL0_wght400_GRAD0_opsz24.svg",
-                lambda: self.add_to_whitelist(item, background_hbox),
+                lambda _, i=item, w=background_hbox: self.add_to_whitelist(i, w),
                 tooltip="Add to whitelist")
             hb_layout.addWidget(add_to_wl_button)
 
@@ -209,7 +245,7 @@ class EmptyFoldersFinderView(BaseView):
             icon_path_open_folder = "folder_open_24dp_5F6368_FILL0_wght400_GRAD0_opsz24.svg"
             open_item_button = create_button_fl(
                 icon_path_open_folder if os.path.isdir(item) else icon_path_open_file,
-                lambda: os.startfile(item),
+                lambda _, i=item: os.startfile(i),
                 tooltip=f"Open {"Folder" if os.path.isdir(item) else "File"}")
             hb_layout.addWidget(open_item_button)
 
@@ -243,16 +279,72 @@ class EmptyFoldersFinderView(BaseView):
         
         data = U.load_data()
         data["EFF_last_path"] = path
+        workers_by_root: Dict[str, int] = data.setdefault("EFF_hash_workers", {})
         U.save_data(data)
 
-        folders_and_files = find_empty_folders(path, self.checkbox_trash_turn.isChecked())
-        self.update_folder_list(folders_and_files)
+        self.stop_scan()
+        self.clear_layout()
+        self.start_delete_button.setDisabled(True)
+
+        self.whitelist = set(data.get("EFF_whitelist", []))
+        rules: ScanRules = ScanRules(exclude_paths=self.whitelist)
+        workers: int = get_hash_workers(path, workers_by_root)
+        del_trash_files: bool = self.checkbox_trash_turn.isChecked()
+        self.scan_del_trash_files = del_trash_files
+        progress: ScanProgress = ScanProgress()
+        self.scan_progress = progress
+
+        worker: GeneratorWorker = GeneratorWorker(
+            lambda is_cancelled: iter_empty_folders(
+                path, del_trash_files, rules, workers=workers, progress=progress, is_cancelled=is_cancelled
+            ),
+            parent=self,
+        )
+        worker.batch_ready.connect(lambda items, w=worker: self.scan_batch_ready(w, items))
+        worker.done.connect(lambda cancelled, w=worker: self.scan_done(w, cancelled))
+        self.scan_worker = worker
+
+        self.start_scan_button.setText("Scanning...")
+        self.start_scan_button.setDisabled(True)
+        self.stop_scan_button.show()
+        self.progress_label.show()
+        self.update_progress_label()
+        self.progress_timer.start()
+        worker.start()
+
+    def stop_scan(self) -> None:
+        if self.scan_worker is not None:
+            self.scan_worker.cancel()
+
+    def scan_batch_ready(self, worker: GeneratorWorker, items: List[str]) -> None:
+        if worker is not self.scan_worker or worker.is_cancelled():
+            return
+
+        self.append_folder_rows(items)
         if U.get_hidden_children(self.folder_list):
-            self.start_scan_button.setText("Rescan")
             self.start_delete_button.setDisabled(False)
-        else:
+
+    def scan_done(self, worker: GeneratorWorker, cancelled: bool) -> None:
+        if worker is not self.scan_worker:
+            return
+
+        self.scan_worker = None
+        self.progress_timer.stop()
+        self.update_progress_label()
+        self.stop_scan_button.hide()
+        self.start_scan_button.setDisabled(False)
+        self.start_scan_button.setText("Rescan")
+
+        if cancelled:
+            self.main_window.show_toast("Scan stopped")
+        elif not U.get_hidden_children(self.folder_list):
             self.main_window.show_toast("No empty folders found")
 
+    def update_progress_label(self) -> None:
+        self.progress_label.setText(
+            f"Visited: {self.scan_progress.dirs_visited} dirs\nFound: {self.scan_progress.candidates}"
+        )
+
     def add_to_whitelist(self, folder: str, item: QWidget) -> None:
         data = U.load_data()
         whitelist: List[Optional[str]] = data.setdefault("EFF_whitelist", [])
@@ -269,6 +361,7 @@ class EmptyFoldersFinderView(BaseView):
 
 
     def start_deletion(self) -> None:
+        self.stop_scan()
         to_trashcan = self.checkbox_trashcan_turn.isChecked()
         auto_delete_empty_folders = self.checkbox_auto_delete_folder.isChecked()
 
@@ -283,13 +376,21 @@ class EmptyFoldersFinderView(BaseView):
                     childs.append((path, widget))
                     break
         
+        results: List[DeleteResult] = del_from_paths(
+            [path for path, _ in childs],
+            to_trashcan,
+            auto_delete_empty_folders,
+            fake_delete=self.main_window.fake_delete,
+            rules=ScanRules(exclude_paths=U.load_data().get("EFF_whitelist", [])),
+            del_trash_files=self.scan_del_trash_files,
+        )
+        deleted: Set[str] = {result.path for result in results if result.success and not result.parent_cleanup}
         for path, widget in childs:
-            result, log_message = del_from_path(path, to_trashcan, auto_delete_empty_folders, fake_delete=self.main_window.fake_delete)
-            if result: 
+            if path in deleted:
                 widget.deleteLater()
             else:
                 print(f"Error: Failed to delete {path}")
-            log_messages.extend(log_message)
+        log_messages.extend(result.message for result in results)
 
         self.scroll_area_label.show()
         self.log_widget.show()
@@ -297,7 +398,8 @@ class EmptyFoldersFinderView(BaseView):
         self.reset_state()
     
     def reset_state(self, with_log: bool = False, with_folder_list: bool = False) -> None:
-        self.start_scan_button.setText("Start Scan")
+        if self.scan_worker is None:
+            self.start_scan_button.setText("Start Scan")
         self.start_delete_button.setDisabled(True)
         
         if with_folder_list:
@@ -1,21 +1,35 @@
 import os
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QDragEnterEvent, QDropEvent
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel
+from PyQt5.QtCore import Qt, QTimer, QRect
+from PyQt5.QtGui import QDragEnterEvent, QDropEvent, QImage, QPixmap
 
-from scripts.find_folder import find_and_open_folder
+from classes.thumbnails import THUMBNAIL_SIZE, ThumbnailLoader
+from classes.worker import GeneratorWorker
+from scripts.find_folder import fuzzy_find_folder, iter_find_and_open_folder, query_folders, rebuild_folder_index
+from scripts.folder_query import is_structured_query, parse_query
 from styles.header import HeaderButtons
-from styles.material import MaterialIconPushButton, MaterialLineEdit, MaterialScrollArea
+from styles.material import MaterialIconCheckbox, MaterialIconPushButton, MaterialLineEdit, MaterialScrollArea
 from views import BaseView
 import utils as U
 
+SEARCH_DEBOUNCE_MS: int = 300
+MIN_LIVE_QUERY_LENGTH: int = 2
+THUMBNAIL_PRELOAD_MARGIN: int = 300
+
 
 class FindFolderView(BaseView):
     def __init__(self, parent) -> None:
         super().__init__("Folder Search", parent)
 
+        self.search_worker: Optional[GeneratorWorker] = None
+        self.reindex_worker: Optional[GeneratorWorker] = None
+        self.thumbnail_loader: ThumbnailLoader = ThumbnailLoader(parent=self)
+        self.thumbnail_loader.thumbnail_ready.connect(self.thumbnail_ready)
+        self.thumbnail_strips: Dict[str, QWidget] = {}
+        self.pending_thumbnail_rows: List[QWidget] = []
+
         self.add_button(HeaderButtons.BACK)
         self.add_button(HeaderButtons.HISTORY, postion_left=False)
         self.add_button(HeaderButtons.BL_MANAGER, postion_left=False)
@@ -34,7 +48,9 @@ class FindFolderView(BaseView):
         
         self.input_field: MaterialLineEdit = MaterialLineEdit()
         self.input_field.setPlaceholderText("Enter or drop folder here")
+        self.input_field.setToolTip("Queries: a AND NOT b, a OR (b c), \"a b\", files>20, size>1gb, age<30d")
         self.input_field.returnPressed.connect(self.submit_button_clicked)
+        self.input_field.textEdited.connect(self.input_text_edited)
         self.input_field.setFixedHeight(self.height_input_field_and_accept_button)
         self.input_layout.addWidget(self.input_field, stretch=8)
         
@@ -42,6 +58,18 @@ class FindFolderView(BaseView):
         self.submit_button.clicked.connect(self.submit_button_clicked)
         self.submit_button.setFixedHeight(self.height_input_field_and_accept_button)
         self.input_layout.addWidget(self.submit_button, stretch=2)
+
+        self.reindex_button: MaterialIconPushButton = MaterialIconPushButton(text="Reindex")
+        self.reindex_button.setToolTip("Rebuild the folder index from disk")
+        self.reindex_button.clicked.connect(self.reindex_button_clicked)
+        self.reindex_button.setFixedHeight(self.height_input_field_and_accept_button)
+        self.input_layout.addWidget(self.reindex_button, stretch=1)
+
+        self.fuzzy_checkbox: MaterialIconCheckbox = MaterialIconCheckbox()
+        self.fuzzy_checkbox.setText("Fuzzy")
+        self.fuzzy_checkbox.setToolTip("Typo-tolerant search over the folder index")
+        self.fuzzy_checkbox.stateChanged.connect(lambda _: self.start_search())
+        self.input_layout.addWidget(self.fuzzy_checkbox)
         
         self.scroll_area: MaterialScrollArea = MaterialScrollArea()
         self.scroll_area.setWidgetResizable(True)
@@ -52,12 +80,93 @@ class FindFolderView(BaseView):
         self.scroll_layout: QVBoxLayout = QVBoxLayout(self.scroll_widget)
         self.scroll_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
         self.scroll_area.setWidget(self.scroll_widget)
+        self.scroll_area.verticalScrollBar().valueChanged.connect(self.load_visible_thumbnails)
+
+        self.search_timer: QTimer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.start_search)
         
     def submit_button_clicked(self) -> None:
         input_text: str = self.input_field.text()
-        folder_name, folders = find_and_open_folder(input_text)
-        self.main_window.add_to_history(folder_name)
-        self.create_folder_buttons(folders)
+        self.main_window.add_to_history(os.path.basename(input_text))
+        self.start_search(show_errors=True)
+
+    def input_text_edited(self, text: str) -> None:
+        if len(text.strip()) < MIN_LIVE_QUERY_LENGTH:
+            self.search_timer.stop()
+            return
+        self.search_timer.start()
+
+    def start_search(self, show_errors: bool = False) -> None:
+        self.search_timer.stop()
+        input_text: str = self.input_field.text()
+
+        structured: bool = is_structured_query(input_text)
+        if structured:
+            try:
+                parse_query(input_text)
+            except ValueError as e:
+                if show_errors:
+                    self.main_window.show_toast(f"Error: {e}")
+                return
+
+        self.cancel_search()
+        self.clear_layout()
+        if not input_text.strip():
+            return
+
+        if structured:
+            generator_factory = lambda _: query_folders(input_text)
+        elif self.fuzzy_checkbox.isChecked():
+            generator_factory = lambda _: fuzzy_find_folder(input_text)
+        else:
+            generator_factory = lambda is_cancelled: iter_find_and_open_folder(
+                input_text, is_cancelled, cache=self.main_window.search_cache
+            )
+
+        worker: GeneratorWorker = GeneratorWorker(generator_factory, parent=self)
+        worker.batch_ready.connect(lambda folders, w=worker: self.search_batch_ready(w, folders))
+        worker.done.connect(lambda cancelled, w=worker: self.search_done(w, cancelled))
+        self.search_worker = worker
+        self.submit_button.setText("Searching...")
+        worker.start()
+
+    def cancel_search(self) -> None:
+        if self.search_worker is not None:
+            self.search_worker.cancel()
+            self.search_worker = None
+            self.submit_button.setText("Search")
+
+    def search_batch_ready(self, worker: GeneratorWorker, folders: List[str | Tuple[str, float]]) -> None:
+        if worker is self.search_worker:
+            self.append_folder_buttons(folders)
+
+    def search_done(self, worker: GeneratorWorker, cancelled: bool) -> None:
+        if worker is not self.search_worker:
+            return
+
+        self.search_worker = None
+        self.submit_button.setText("Search")
+        self.main_window.save_search_cache()
+
+    def reindex_button_clicked(self) -> None:
+        if self.reindex_worker is not None:
+            return
+
+        self.reindex_button.setDisabled(True)
+        self.reindex_button.setText("Indexing...")
+
+        worker: GeneratorWorker = GeneratorWorker(lambda _: [len(rebuild_folder_index())], parent=self)
+        worker.batch_ready.connect(lambda counts: self.main_window.show_toast(f"Indexed {counts[0]} folders"))
+        worker.done.connect(lambda _: self.reindex_done())
+        self.reindex_worker = worker
+        worker.start()
+
+    def reindex_done(self) -> None:
+        self.reindex_worker = None
+        self.reindex_button.setText("Reindex")
+        self.reindex_button.setDisabled(False)
 
     def start_file(self, folder: str) -> None:
         if os.path.exists(folder):
@@ -65,23 +174,81 @@ class FindFolderView(BaseView):
         else:
             self.main_window.show_toast(f"Error: Folder '{folder}' does not exist.")
             childs = U.get_hidden_children(self.scroll_layout)
-            for button in childs:
-                if button.text() == folder:
-                    button.hide()
-                    button.deleteLater()
+            for row in childs:
+                if row.property("folder") == folder:
+                    self.thumbnail_strips.pop(folder, None)
+                    row.hide()
+                    row.deleteLater()
                     return
 
 
     def create_folder_buttons(self, folders: List[str]) -> None:
         self.clear_layout()
-        
+        self.append_folder_buttons(folders)
+
+    def append_folder_buttons(self, folders: List[str | Tuple[str, float]]) -> None:
         for folder in folders:
-            button: MaterialIconPushButton = MaterialIconPushButton(text=folder)
+            text: str = folder
+            if isinstance(folder, tuple):
+                folder, score = folder
+                text = f"{folder}   ({score:.0f}%)"
+
+            row: QWidget = QWidget()
+            row.setProperty("folder", folder)
+            row_layout: QVBoxLayout = QVBoxLayout(row)
+            row_layout.setContentsMargins(0, 0, 0, 0)
+            row_layout.setSpacing(5)
+
+            button: MaterialIconPushButton = MaterialIconPushButton(text=text)
             button.setFixedHeight(50)
             button.clicked.connect(lambda _, f=folder: self.start_file(f))
-            self.scroll_layout.addWidget(button)
+            row_layout.addWidget(button)
+
+            strip: QWidget = QWidget()
+            strip_layout: QHBoxLayout = QHBoxLayout(strip)
+            strip_layout.setContentsMargins(10, 0, 10, 0)
+            strip_layout.setAlignment(Qt.AlignmentFlag.AlignLeft)
+            strip.hide()
+            row_layout.addWidget(strip)
+
+            self.thumbnail_strips[folder] = strip
+            self.pending_thumbnail_rows.append(row)
+            self.scroll_layout.addWidget(row)
+            row.show()
+
+        QTimer.singleShot(0, self.load_visible_thumbnails)
+
+    def load_visible_thumbnails(self) -> None:
+        """Запрашивает превью только для строк в видимой области (с запасом), остальные ждут прокрутки."""
+        self.scroll_layout.activate()
+        viewport = self.scroll_area.viewport()
+        visible: QRect = QRect(0, self.scroll_area.verticalScrollBar().value(), viewport.width(), viewport.height())
+        visible.adjust(0, -THUMBNAIL_PRELOAD_MARGIN, 0, THUMBNAIL_PRELOAD_MARGIN)
+
+        pending: List[QWidget] = []
+        for row in self.pending_thumbnail_rows:
+            if row.isVisible() and row.geometry().intersects(visible):
+                self.thumbnail_loader.request(row.property("folder"))
+            else:
+                pending.append(row)
+        self.pending_thumbnail_rows = pending
+
+    def thumbnail_ready(self, folder: str, number: int, image: QImage) -> None:
+        strip: Optional[QWidget] = self.thumbnail_strips.get(folder)
+        if strip is None:
+            return
+
+        label: QLabel = QLabel()
+        label.setFixedSize(THUMBNAIL_SIZE)
+        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        label.setPixmap(QPixmap.fromImage(image))
+        strip.layout().addWidget(label)
+        strip.show()
 
     def clear_layout(self) -> None:
+        self.thumbnail_loader.cancel()
+        self.thumbnail_strips.clear()
+        self.pending_thumbnail_rows.clear()
         for _ in range(self.scroll_layout.count()):
             item = self.scroll_layout.takeAt(0).widget()
             if item:
@@ -1,17 +1,19 @@
-from typing import Dict, Generator, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from styles.header import HeaderButtons
 from views.base_view import BaseView
-from PyQt5.QtWidgets import QHBoxLayout, QLabel, QWidget, QVBoxLayout, QSizePolicy, QApplication
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QHBoxLayout, QLabel, QWidget, QVBoxLayout, QSizePolicy, QTableView, QAbstractItemView, QHeaderView, QSpinBox
+from PyQt5.QtCore import Qt, QModelIndex
 
 import utils as U
 
+from classes.pair_review_model import ARTIST_COLUMN, FOLDER_COLUMN, SCORE_COLUMN, PairReviewFilter, PairReviewModel
+from classes.worker import GeneratorWorker
 from scripts.get_same_artists_folders import (
-    BL_WL_LIST_FILE, PATHS, clean_folders_list, compare_folders, create_folders_dict,
-    get_folders_list, get_new_folders_list, load_list, save_to_list, Match, move_matched_folders
+    BL_WL_LIST_FILE, SIMILARITY_THRESHOLD, Candidate, collect_folders, load_list, open_pair_score_cache,
+    score_folders, Match, move_matched_folders
 )
-from styles.material import MaterialColor, MaterialIconButton, MaterialIconPushButton, MaterialScrollArea
-from styles.popups import AcceptPopup
+from scripts.gsaf_decisions import DecisionStore
+from styles.material import MaterialColor, MaterialIconButton, MaterialIconPushButton, MaterialLineEdit, MaterialScrollArea
 
 
 class GetSameArtistsFoldersView(BaseView):
@@ -48,10 +50,73 @@ class GetSameArtistsFoldersView(BaseView):
         self.hbox.setSpacing(10)
         self.base_layout.addLayout(self.hbox)
 
+        self.scan_worker: Optional[GeneratorWorker] = None
+        self.decisions: DecisionStore = DecisionStore(BL_WL_LIST_FILE)
+        self.matches: List[Match] = []
+
+        self.review_layout: QVBoxLayout = QVBoxLayout()
+        self.review_layout.setSpacing(10)
+        self.hbox.addLayout(self.review_layout, stretch=8)
+
+        self.filter_layout: QHBoxLayout = QHBoxLayout()
+        self.review_layout.addLayout(self.filter_layout)
+
+        self.filter_field: MaterialLineEdit = MaterialLineEdit()
+        self.filter_field.setPlaceholderText("Filter by folder or artist")
+        self.filter_field.textChanged.connect(lambda text: self.review_filter.set_text(text))
+        self.filter_layout.addWidget(self.filter_field, stretch=6)
+
+        self.min_score_spin: QSpinBox = QSpinBox()
+        self.min_score_spin.setRange(SIMILARITY_THRESHOLD, 100)
+        self.min_score_spin.setValue(SIMILARITY_THRESHOLD)
+        self.min_score_spin.setPrefix("from ")
+        self.min_score_spin.setSuffix("%")
+        self.min_score_spin.valueChanged.connect(self.score_range_changed)
+        self.filter_layout.addWidget(self.min_score_spin, stretch=1)
+
+        self.max_score_spin: QSpinBox = QSpinBox()
+        self.max_score_spin.setRange(SIMILARITY_THRESHOLD, 100)
+        self.max_score_spin.setValue(100)
+        self.max_score_spin.setPrefix("to ")
+        self.max_score_spin.setSuffix("%")
+        self.max_score_spin.valueChanged.connect(self.score_range_changed)
+        self.filter_layout.addWidget(self.max_score_spin, stretch=1)
+
+        self.review_model: PairReviewModel = PairReviewModel(self)
+        self.review_filter: PairReviewFilter = PairReviewFilter(self)
+        self.review_filter.setSourceModel(self.review_model)
+
+        self.review_table: QTableView = QTableView()
+        self.review_table.setModel(self.review_filter)
+        self.review_table.setSortingEnabled(True)
+        self.review_table.sortByColumn(SCORE_COLUMN, Qt.SortOrder.DescendingOrder)
+        self.review_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.review_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.review_table.verticalHeader().setVisible(False)
+        self.review_table.horizontalHeader().setSectionResizeMode(FOLDER_COLUMN, QHeaderView.ResizeMode.Stretch)
+        self.review_table.horizontalHeader().setSectionResizeMode(ARTIST_COLUMN, QHeaderView.ResizeMode.Stretch)
+        self.review_table.setStyleSheet(f"""
+            QTableView {{
+                background-color: {MaterialColor.primary_text_color};
+                color: {MaterialColor.text_color};
+                gridline-color: {MaterialColor.secondary_text_color};
+                selection-background-color: {MaterialColor.accent_color};
+                font-size: 14px;
+            }}
+            QHeaderView::section {{
+                background-color: {MaterialColor.dark_primary_color};
+                color: {MaterialColor.text_color};
+                border: none;
+                padding: 4px;
+            }}
+        """)
+        self.review_table.selectionModel().currentRowChanged.connect(self.current_pair_changed)
+        self.review_layout.addWidget(self.review_table, stretch=3)
+
         self.scroll_area: MaterialScrollArea = MaterialScrollArea()
         self.scroll_area.setWidgetResizable(True)
         self.scroll_area.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-        self.hbox.addWidget(self.scroll_area, stretch=8)
+        self.review_layout.addWidget(self.scroll_area, stretch=1)
 
         self.log_widget: QLabel = QLabel("Log")
         self.log_widget.setObjectName("GetSameArtistsFoldersLog")
@@ -86,6 +151,26 @@ class GetSameArtistsFoldersView(BaseView):
         self.start_button.clicked.connect(self.start_scan)
         self.button_layout.addWidget(self.start_button)
 
+        self.accept_button = MaterialIconPushButton(text="Accept", height=50, shadow=True)
+        self.accept_button.setToolTip("Mark the selected pairs as the same artist; with nothing selected, asks to apply to every pair passing the filter")
+        self.accept_button.clicked.connect(lambda: self.decide_pairs(True))
+        self.button_layout.addWidget(self.accept_button)
+
+        self.ignore_button = MaterialIconPushButton(text="Ignore", height=50, shadow=True)
+        self.ignore_button.setToolTip("Mark the selected pairs as different artists; with nothing selected, asks to apply to every pair passing the filter")
+        self.ignore_button.clicked.connect(lambda: self.decide_pairs(False))
+        self.button_layout.addWidget(self.ignore_button)
+
+        self.undecide_button = MaterialIconPushButton(text="Clear", height=50, shadow=True)
+        self.undecide_button.setToolTip("Clear the decision of the selected pairs; with nothing selected, asks to apply to every pair passing the filter")
+        self.undecide_button.clicked.connect(lambda: self.decide_pairs(None))
+        self.button_layout.addWidget(self.undecide_button)
+
+        self.commit_button = MaterialIconPushButton(text="Commit decisions", special=True, height=50, shadow=True)
+        self.commit_button.setDisabled(True)
+        self.commit_button.clicked.connect(self.commit_decisions)
+        self.button_layout.addWidget(self.commit_button)
+
         self.move_button = MaterialIconPushButton(text="Move", special=True, height=50, shadow=True)
         self.move_button.setDisabled(True)
         self.move_button.clicked.connect(self.move_folders)
@@ -95,70 +180,109 @@ class GetSameArtistsFoldersView(BaseView):
         self.log_widget.clear()
 
     def start_scan(self) -> None:
+        if self.scan_worker is not None:
+            return
+
         self.start_button.setDisabled(True)
+        self.commit_button.setDisabled(True)
+        self.move_button.setDisabled(True)
         self.log_widget.setText("Scanning...")
         self.start_button.setText("Scanning...")
-        QApplication.processEvents()
-
-        folders_list: List[str] = []
-        for path in PATHS:
-            folders_list.extend(get_folders_list(path))
-
-        sorted_folders_list = sorted((clean_folders_list(folder), _path) for folder, _path in folders_list)
-
-        new_folders_list: List[str] = []
-        for path in PATHS:
-            new_folders_list.extend(get_new_folders_list(path))
-
-        folders_dict = create_folders_dict(new_folders_list)
-        whitelist, blacklist = load_list(BL_WL_LIST_FILE)
-
-
-        generator = compare_folders(sorted_folders_list, folders_dict, whitelist, blacklist)
-        try:
-            pair_list: List[Tuple[str, str]] = []
-            while True:
-                result = next(generator)
-
-                if result[3] in pair_list or result[3][::-1] in pair_list:
-                    continue
-                pair_list.append(result[3])
-
-                if isinstance(result, tuple):
-                    accept_popup: AcceptPopup = self.main_window.show_accept_popup(
-                        message=(
-                            f"Comparing '{result[0]}' with '{result[1]}': {result[2]}%.\n"
-                            f"Pair: {result[3][0]} - {result[3][1]}\n"
-                            "Add to list or ignore?\n\n"
-                            "Or click outside the popup to skip"
-                        ),
-                        accept_connect=lambda: self.handle_popup_result(generator, result, True),
-                        cancel_connect=lambda: self.handle_popup_result(generator, result, False),
-                        accept_text="Add to list",
-                        cancel_text="Add to ignore",
-                        size=U.QSizeFloat(0.35, 0.35)
-                    )
-                    U.add_to_clipboard(f"{result[0]} - {result[1]}")
-                    accept_popup.exec_()
-
-        except StopIteration as e:
-            self.matches: Optional[List[Match]] = e.value
-            self.log_widget.setText(f"Scanning completed. Found {len(self.matches)} matches.")
-            self.start_button.setEnabled(True)
-            if self.matches:
-                self.move_button.setEnabled(True)
-                for i in self.matches:
-                    self.log_widget.setText(self.log_widget.text() + f"\n{i.original_folder_name} // {i.folder_name} == {i.similarity}%")
-        
+        self.review_model.set_candidates([])
+        self.decisions.load()
+
+        def scan(_) -> List[Tuple[List[Match], List[Candidate]]]:
+            sorted_folders_list, folders_dict = collect_folders()
+            score_cache = open_pair_score_cache()
+            try:
+                return [score_folders(sorted_folders_list, folders_dict, self.decisions, score_cache)]
+            finally:
+                score_cache.close()
+
+        worker: GeneratorWorker = GeneratorWorker(scan, parent=self)
+        worker.batch_ready.connect(lambda results, w=worker: self.scan_ready(w, results))
+        worker.done.connect(lambda cancelled, w=worker: self.scan_done(w))
+        self.scan_worker = worker
+        worker.start()
+
+    def scan_ready(self, worker: GeneratorWorker, results: List[Tuple[List[Match], List[Candidate]]]) -> None:
+        if worker is not self.scan_worker:
+            return
+
+        self.matches, candidates = results[0]
+        self.review_model.set_candidates(candidates)
+        self.commit_button.setDisabled(not candidates)
+        self.log_widget.setText(
+            f"Scanning completed. Found {len(self.matches)} matches, {len(candidates)} pairs to review."
+        )
+        self.show_matches()
+
+    def scan_done(self, worker: GeneratorWorker) -> None:
+        if worker is not self.scan_worker:
+            return
+
+        self.scan_worker = None
         self.start_button.setDisabled(False)
         self.start_button.setText("Start scan")
-        if self.matches:
-            self.move_button.setDisabled(False)
-
-
-    def handle_popup_result(self, generator: Generator, result: Tuple[str, str, int, Tuple[str, str]], is_whitelist: bool) -> None:
-        save_to_list(BL_WL_LIST_FILE, result[3][0], result[3][1], is_whitelist)
-        generator.send(is_whitelist)
+        if self.log_widget.text() == "Scanning...":
+            self.log_widget.setText("Scanning failed.")
+
+    def show_matches(self) -> None:
+        lines = [self.log_widget.text()]
+        lines.extend(f"{i.original_folder_name} // {i.folder_name} == {i.similarity}%" for i in self.matches)
+        self.log_widget.setText("\n".join(lines))
+        self.move_button.setDisabled(not self.matches)
+
+    def score_range_changed(self) -> None:
+        self.review_filter.set_score_range(self.min_score_spin.value(), self.max_score_spin.value())
+
+    def current_pair_changed(self, current: QModelIndex, _: QModelIndex) -> None:
+        if current.isValid():
+            candidate: Candidate = self.review_model.candidates[self.review_filter.mapToSource(current).row()]
+            U.add_to_clipboard(f"{candidate.original_folder_name} - {candidate.artist_name}")
+
+    def decide_pairs(self, decision: Optional[bool]) -> None:
+        """Решение для выделенных строк; если ничего не выделено - для всех строк фильтра, но только после подтверждения."""
+        selected = self.review_table.selectionModel().selectedRows()
+        if selected:
+            self.review_model.set_decision([self.review_filter.mapToSource(index).row() for index in selected], decision)
+            self.review_table.clearSelection()
+            return
+
+        rows = self.review_filter.source_rows()
+        if not rows:
+            self.main_window.show_toast("No pairs to decide")
+            return
+
+        action = {True: "Accept", False: "Ignore", None: "Clear the decision of"}[decision]
+        self.main_window.show_accept_popup(
+            f"Nothing is selected. {action} all {len(rows)} pairs passing the filter?",
+            lambda: self.review_model.set_decision(rows, decision),
+            accept_text="Apply to all",
+        )
+
+    def commit_decisions(self) -> None:
+        decided = self.review_model.decided()
+        if not decided:
+            self.main_window.show_toast("No decisions to commit")
+            return
+
+        self.decisions.add_many(
+            (candidate.pair[0], candidate.pair[1], decision) for candidate, decision in decided
+        )
+        for candidate, decision in decided:
+            if decision:
+                self.matches.extend(match for match in candidate.matches if match not in self.matches)
+
+        decided_ids = {id(candidate) for candidate, _ in decided}
+        self.review_model.set_candidates(
+            candidate for candidate in self.review_model.candidates if id(candidate) not in decided_ids
+        )
+        self.commit_button.setDisabled(not self.review_model.candidates)
+        self.log_widget.setText(
+            f"Committed {len(decided)} decisions. {len(self.review_model.candidates)} pairs left to review."
+        )
+        self.show_matches()
 
     def move_folders(self) -> None:
         if self.matches: